@@ -34,9 +34,6 @@ torrent_check_sleep_time = 30
 # Whether or not to use cached_paths
 cached_paths_toggle = True
 
-# Profiles the execution
-profile_code = ""
-
 
 # An alternative to send_message() in the main script
 def send_message_alt(
@@ -66,6 +63,16 @@ parser.add_argument(
     nargs="*",
     required=True,
 )
+parser.add_argument(
+    "--profile",
+    help="Comma separated stages to profile into the logs folder. EX: process_torrent",
+    required=False,
+)
+parser.add_argument(
+    "--profile_memory",
+    help="Traces the peak memory of each stage with tracemalloc.",
+    required=False,
+)
 parser.add_argument(
     "-df",
     "--download_folders",
@@ -77,6 +84,13 @@ parser.add_argument(
 
 parser = parser.parse_args()
 
+# Set up the profiling of the chosen stages
+if parser.profile or parser.profile_memory:
+    set_profiling(
+        parser.profile or [],
+        parse_bool_argument(parser.profile_memory) if parser.profile_memory else False,
+    )
+
 # Parse the user's download folders
 if parser.download_folders is not None:
     new_download_folders = []
@@ -199,14 +213,8 @@ def get_torrents(qb):
 
 
 # Returns a list of any files containing unacceptable keywords
-def exclude_unacceptable_files(files, unacceptable_regexes):
-    return [
-        file
-        for file in files
-        if re.search(
-            "|".join(unacceptable_regexes), os.path.basename(file.name), re.IGNORECASE
-        )
-    ]
+def exclude_unacceptable_files(files, matcher):
+    return [file for file in files if matcher.search(os.path.basename(file.name))]
 
 
 # Checks if a volume is an upgrade or a new item
@@ -236,18 +244,10 @@ def check_upgrade_or_new(volume, existing_files):
     return [volume.name]
 
 
-# Joins all the unacceptable keywords into a single regex
-# for faster searching
-modified_keywords = (
-    [rf"({keyword})" for keyword in unacceptable_keywords]
-    if unacceptable_keywords
-    else []
-)
-
-
 # Checks if the torrent name contains unacceptable keywords
+# (unacceptable_keyword_matcher is compiled once by the main script)
 def has_unacceptable_keywords(torrent):
-    if re.search("|".join(modified_keywords), torrent.name, re.IGNORECASE):
+    if unacceptable_keyword_matcher.search(torrent.name):
         send_message_alt(
             f"\n\t\tTorrent: `{torrent.name}` contains an unacceptable keyword."
         )
@@ -361,7 +361,7 @@ def check_files(torrent, files, qb):
     files_to_exclude = []
 
     # Check for unacceptable keywords and delete corresponding files if toggle is enabled
-    if modified_keywords and delete_unacceptable_files_toggle:
+    if unacceptable_keyword_matcher and delete_unacceptable_files_toggle:
         print("\n\tChecking for unacceptable keywords")
 
         # check torent title first
@@ -371,7 +371,9 @@ def check_files(torrent, files, qb):
             files_to_exclude = files
             return files_to_exclude
 
-        files_to_exclude.extend(exclude_unacceptable_files(files, modified_keywords))
+        files_to_exclude.extend(
+            exclude_unacceptable_files(files, unacceptable_keyword_matcher)
+        )
         for excluded_file in files_to_exclude:
             base_name = os.path.basename(excluded_file.name)
             print(f"\n\t\tFile: {base_name} contains an unacceptable keyword.")
@@ -424,6 +426,7 @@ def delete_torrent(torrent):
 
 
 # Process a single torrent
+@metered_stage
 def process_torrent(torrent, qb):
     files = torrent.files.data
     files_to_exclude = check_files(torrent, files, qb)
@@ -574,10 +577,7 @@ def main():
 
 if __name__ == "__main__":
     try:
-        if profile_code == "main()":
-            cProfile.run(profile_code, sort="cumtime")
-        else:
-            main()
+        main()
     except Exception as e:
         send_message_alt(
             f"Error: {e}",
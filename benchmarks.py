@@ -0,0 +1,715 @@
+#!/usr/bin/env python3
+import argparse
+import ast
+import pstats
+import statistics
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+import komga_cover_extractor
+from komga_cover_extractor import *
+
+# Publishers, groups and extras cycled through the synthetic library
+benchmark_publishers = ["Yen Press", "Kodansha", "Seven Seas", "VIZ Media"]
+benchmark_groups = ["Oak", "danke-Empire", "1r0n", "LuCaZ"]
+benchmark_extras = ["", " (Premium)", " (Digital Edition)", ""]
+
+
+# Builds a list of synthetic volume file names,
+# volumes_per_series volumes for each series.
+def get_synthetic_volume_names(count, volumes_per_series=20):
+    names = []
+    for i in range(count):
+        series = i // volumes_per_series
+        number = i % volumes_per_series + 1
+        names.append(
+            "Series %d v%02d (20%02d) (%s)%s [%s].cbz"
+            % (
+                series,
+                number,
+                10 + number % 15,
+                benchmark_groups[series % len(benchmark_groups)],
+                benchmark_extras[number % len(benchmark_extras)],
+                benchmark_publishers[series % len(benchmark_publishers)],
+            )
+        )
+    return names
+
+
+# Gets the real-world file names used throughout tests.py
+def get_corpus_names():
+    with open(os.path.join(ROOT_DIR, "tests.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    names = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Constant)
+            and isinstance(node.value, str)
+            and get_file_extension(node.value) in file_extensions
+            and os.path.basename(node.value) == node.value
+        ):
+            names.append(node.value)
+    return remove_duplicates(names)
+
+
+# Gets count distinct series names parsed from the names in the corpus,
+# numbering repeats once the corpus runs out of series.
+# Only series that parse back cleanly from a synthetic volume name are used.
+def get_corpus_series_names(count):
+    series_names = []
+    for name in get_corpus_names():
+        # some corpus names are deliberately malformed and print parse errors
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            record = parse_release_name(name, ROOT_DIR, test_mode=True)
+        series_name = record.series_name
+        if (
+            not series_name
+            or not series_name[-1].isalnum()
+            or series_name == os.path.basename(ROOT_DIR)
+            or series_name.lower() in map(str.lower, series_names)
+        ):
+            continue
+
+        synthetic_record = parse_release_name(
+            get_synthetic_volume_name(series_name, 12, benchmark_groups[0]),
+            ROOT_DIR,
+            test_mode=True,
+        )
+        if (
+            synthetic_record.series_name == series_name
+            and synthetic_record.release_number == 12
+            and not contains_brackets(series_name)
+            and not re.search(r"\d", series_name)
+        ):
+            series_names.append(series_name)
+
+    return [
+        series_names[i % len(series_names)]
+        + (f" {i // len(series_names) + 1}" if i >= len(series_names) else "")
+        for i in range(count)
+    ]
+
+
+# Gets a synthetic volume file name for the series
+def get_synthetic_volume_name(series_name, number, group, extension=".cbz", extra=""):
+    return f"{series_name} v{number:02d} (20{10 + number % 15}) (Digital){extra} ({group}){extension}"
+
+
+# Returns the bytes of a tiny jpeg cover
+@lru_cache(maxsize=None)
+def get_tiny_cover():
+    with io.BytesIO() as output:
+        Image.new("RGB", (60, 90), (200, 80, 40)).save(output, format="JPEG")
+        return output.getvalue()
+
+
+# Writes a tiny cbz or epub file, or a 7z archive for convert_to_cbz().
+def write_synthetic_file(path, volume_number):
+    cover = get_tiny_cover()
+    extension = get_file_extension(path)
+
+    if extension == ".7z":
+        with py7zr.SevenZipFile(path, "w") as archive:
+            archive.writestr(cover, "001.jpg")
+        return
+
+    with zipfile.ZipFile(path, "w") as archive:
+        if extension == ".epub":
+            archive.writestr("mimetype", "application/epub+zip")
+            archive.writestr(
+                "META-INF/container.xml",
+                '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles><rootfile full-path="content.opf" media-type="application/oebps-package+xml"/></rootfiles></container>',
+            )
+            archive.writestr(
+                "content.opf",
+                f'<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0"><metadata xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:title>Volume {volume_number}</dc:title><meta name="cover" content="cover"/></metadata><manifest><item id="cover" href="cover.jpg" media-type="image/jpeg" properties="cover-image"/></manifest></package>',
+            )
+            archive.writestr("cover.jpg", cover)
+        else:
+            archive.writestr("001.jpg", cover)
+            archive.writestr("002.jpg", cover)
+
+
+# Generates a synthetic library of series_count series with volume_count
+# volumes each, and a download folder holding duplicates, upgrades, new
+# volumes, new series and archives to convert.
+# Returns the (library, downloads) folders.
+def generate_synthetic_library(base_dir, series_count, volume_count):
+    library = os.path.join(base_dir, "library")
+    downloads = os.path.join(base_dir, "downloads")
+
+    # One extra series for every ten in the library is only in the downloads
+    new_series_count = max(series_count // 10, 1)
+    series_names = get_corpus_series_names(series_count + new_series_count)
+
+    for index, series_name in enumerate(series_names):
+        group = benchmark_groups[index % len(benchmark_groups)]
+
+        # every fifth series is a light novel
+        extension = ".epub" if index % 5 == 4 else ".cbz"
+
+        if index < series_count:
+            series_folder = os.path.join(library, series_name)
+            os.makedirs(series_folder)
+            for number in range(1, volume_count + 1):
+                write_synthetic_file(
+                    os.path.join(
+                        series_folder,
+                        get_synthetic_volume_name(
+                            series_name, number, group, extension
+                        ),
+                    ),
+                    number,
+                )
+
+            # a duplicate of the last volume
+            download_names = [
+                get_synthetic_volume_name(series_name, volume_count, group, extension)
+            ]
+            if index % 2 == 0:
+                # a premium upgrade of the first volume
+                download_names.append(
+                    get_synthetic_volume_name(
+                        series_name, 1, group, extension, extra=" (Premium)"
+                    )
+                )
+                # another group's release of the last volume
+                download_names.append(
+                    get_synthetic_volume_name(
+                        series_name,
+                        volume_count,
+                        benchmark_groups[(index + 1) % len(benchmark_groups)],
+                        extension,
+                    )
+                )
+            if index % 3 == 0:
+                # the next volume, packed in an archive that needs converting
+                download_names.append(
+                    get_synthetic_volume_name(
+                        series_name, volume_count + 1, group, ".7z"
+                    )
+                )
+            else:
+                # the next volume
+                download_names.append(
+                    get_synthetic_volume_name(
+                        series_name, volume_count + 1, group, extension
+                    )
+                )
+        else:
+            download_names = [
+                get_synthetic_volume_name(series_name, number, group, extension)
+                for number in range(1, min(volume_count, 3) + 1)
+            ]
+
+        # each release sits in its own series folder, as it would
+        # after create_folders_for_items_in_download_folder()
+        download_folder = os.path.join(downloads, series_name)
+        os.makedirs(download_folder)
+        for download_name in download_names:
+            write_synthetic_file(
+                os.path.join(download_folder, download_name),
+                get_release_number_cache(download_name),
+            )
+
+    return library, downloads
+
+
+# Points the script at a fresh copy of the synthetic library.
+def reset_benchmark_state(pristine_dir, work_dir):
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    shutil.copytree(pristine_dir, work_dir)
+
+    library = os.path.join(work_dir, "library")
+    downloads = os.path.join(work_dir, "downloads")
+    komga_cover_extractor.paths = [library]
+    komga_cover_extractor.download_folders = [downloads]
+    komga_cover_extractor.paths_with_types = []
+    komga_cover_extractor.LOGS_DIR = os.path.join(work_dir, "logs")
+    komga_cover_extractor.cache_manager = CacheManager(
+        os.path.join(work_dir, "logs", "cache")
+    )
+    komga_cover_extractor.processed_files = TrackedSet()
+    komga_cover_extractor.moved_files = TrackedSet()
+    komga_cover_extractor.transferred_files = TrackedSet()
+    komga_cover_extractor.transferred_dirs = TrackedSet()
+
+    # every stage starts with cold caches
+    for cache in list(cache_registry.values()):
+        clear_registered_cache(cache)
+
+    return library, downloads
+
+
+# Gets the paths of the files in a directory tree, relative to it.
+def get_relative_files(dir_path):
+    return [
+        os.path.relpath(os.path.join(root, file), dir_path)
+        for root, dirs, files in scandir.walk(dir_path)
+        for file in files
+    ]
+
+
+# The postconditions of each stage, checked after it's timed so a stage that
+# silently did nothing can't report a fast timing. Each one returns what went
+# wrong, or None. (work_dir is the stage's copy of the pristine_dir)
+def check_parse(pristine_dir, work_dir, result):
+    parsed_count = sum(len(volumes) for volumes in result)
+    library_count = len(get_relative_files(os.path.join(pristine_dir, "library")))
+    if parsed_count != library_count:
+        return f"parsed {parsed_count} of the {library_count} library files"
+
+
+def check_convert_to_cbz(pristine_dir, work_dir, result):
+    archives = [
+        file
+        for file in get_relative_files(os.path.join(pristine_dir, "downloads"))
+        if get_file_extension(file) in convertable_file_extensions
+    ]
+    if not archives:
+        return "the library has no archives to convert"
+
+    downloads = get_relative_files(os.path.join(work_dir, "downloads"))
+    for archive in archives:
+        if archive in downloads:
+            return f"{archive} was not converted"
+        if f"{get_extensionless_name(archive)}.cbz" not in downloads:
+            return f"{archive} has no converted cbz"
+
+
+def check_duplicates_removed(pristine_dir, work_dir, result):
+    before = len(get_relative_files(os.path.join(pristine_dir, "downloads")))
+    after = len(get_relative_files(os.path.join(work_dir, "downloads")))
+    if after >= before:
+        return "no duplicate volumes were removed"
+
+
+def check_covers_extracted(pristine_dir, work_dir, result):
+    library = os.path.join(work_dir, "library")
+    files = get_relative_files(library)
+    volumes = [file for file in files if get_file_extension(file) in file_extensions]
+    for volume in volumes:
+        if f"{get_extensionless_name(volume)}.jpg" not in files:
+            return f"no cover was extracted for {volume}"
+
+
+def check_series_moved(pristine_dir, work_dir, result):
+    before = len(get_relative_files(os.path.join(pristine_dir, "library")))
+    after = len(get_relative_files(os.path.join(work_dir, "library")))
+    if after <= before:
+        return "no downloads were moved into the library"
+
+
+# The stages timed against the synthetic library, as
+# (name, function(library, downloads), check(pristine_dir, work_dir, result))
+library_benchmark_stages = [
+    (
+        "parse",
+        lambda library, downloads: [
+            upgrade_to_volume_class(
+                upgrade_to_file_class(files, root, test_mode=True), test_mode=True
+            )
+            for root, dirs, files in scandir.walk(library)
+        ],
+        check_parse,
+    ),
+    (
+        "convert_to_cbz",
+        lambda library, downloads: convert_to_cbz(),
+        check_convert_to_cbz,
+    ),
+    (
+        "check_for_duplicate_volumes",
+        lambda library, downloads: check_for_duplicate_volumes([downloads]),
+        check_duplicates_removed,
+    ),
+    (
+        "extract_covers",
+        lambda library, downloads: extract_covers(paths_to_process=[library]),
+        check_covers_extracted,
+    ),
+    (
+        "check_for_existing_series",
+        lambda library, downloads: (
+            cache_existing_library_paths([library], [downloads]),
+            check_for_existing_series(),
+        ),
+        check_series_moved,
+    ),
+]
+
+
+# Times each stage against synthetic libraries of each scale,
+# where a scale is a (series, volumes per series) pair.
+def benchmark_library(scales, output_path):
+    results = {
+        "script_version": script_version_text,
+        "python": sys.version.split()[0],
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "scales": [],
+    }
+    original_logs_dir = LOGS_DIR
+
+    for series_count, volume_count in scales:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # keep any logs from generating the library out of the real logs
+            komga_cover_extractor.LOGS_DIR = os.path.join(temp_dir, "logs")
+
+            pristine_dir = os.path.join(temp_dir, "pristine")
+            work_dir = os.path.join(temp_dir, "work")
+
+            start = time.perf_counter()
+            generate_synthetic_library(pristine_dir, series_count, volume_count)
+            print(
+                f"\nGenerated {series_count} series x {volume_count} volumes in {time.perf_counter() - start:.2f}s"
+            )
+
+            scale_result = {
+                "series": series_count,
+                "volumes_per_series": volume_count,
+                "stages": {},
+            }
+            for name, stage, check in library_benchmark_stages:
+                library, downloads = reset_benchmark_state(pristine_dir, work_dir)
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    result = stage(library, downloads)
+                    elapsed = time.perf_counter() - start
+
+                problem = check(pristine_dir, work_dir, result)
+                if problem:
+                    raise RuntimeError(f"The {name} stage failed its check: {problem}")
+                scale_result["stages"][name] = elapsed
+                print(f"\t{name}: {elapsed:.3f}s")
+
+            results["scales"].append(scale_result)
+
+    komga_cover_extractor.LOGS_DIR = original_logs_dir
+
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"\nSaved results to {output_path}")
+    return results
+
+
+# Returns a copy of a slotted class that stores its
+# attributes in a per-instance __dict__ instead.
+def get_dict_based_class(cls):
+    attrs = {
+        key: value
+        for key, value in vars(cls).items()
+        if key not in ("__slots__", "__dict__", "__weakref__")
+        and key not in cls.__slots__
+    }
+    return type(cls.__name__, (), attrs)
+
+
+# Copies the attributes of each object into a new instance of cls.
+def clone_objects(objects, cls):
+    results = []
+    for obj in objects:
+        clone = object.__new__(cls)
+        for slot in type(obj).__slots__:
+            setattr(clone, slot, getattr(obj, slot))
+        results.append(clone)
+    return results
+
+
+# Measures the memory used by a list of objects built by build().
+def measure_memory(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = build()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objects, current, peak, elapsed
+
+
+# Compares the memory used by slotted Volume and File objects
+# against dict-based copies of the same classes.
+def benchmark_memory(count):
+    names = get_synthetic_volume_names(count)
+    root = os.path.join(ROOT_DIR, "benchmark_library")
+
+    print("\nParsing %d synthetic volumes..." % count)
+    start = time.perf_counter()
+    files = upgrade_to_file_class(names, root, test_mode=True)
+    volumes = upgrade_to_volume_class(files, test_mode=True)
+    print("\tParsed in %.2fs" % (time.perf_counter() - start))
+
+    results = {}
+    for label, objects in [("File", files), ("Volume", volumes)]:
+        slotted_class = type(objects[0])
+        for mode, cls in [
+            ("slots", slotted_class),
+            ("dict", get_dict_based_class(slotted_class)),
+        ]:
+            clones, current, peak, elapsed = measure_memory(
+                lambda: clone_objects(objects, cls)
+            )
+            results[(label, mode)] = current
+            print(
+                "\t%-6s %-5s %8.2f MiB (%4d bytes/object, peak %.2f MiB) in %.2fs"
+                % (
+                    label,
+                    mode,
+                    current / 1024 / 1024,
+                    current / len(clones),
+                    peak / 1024 / 1024,
+                    elapsed,
+                )
+            )
+            del clones
+
+        saved = results[(label, "dict")] - results[(label, "slots")]
+        print(
+            "\t%-6s slots save %.2f MiB (%.0f%%)"
+            % (label, saved / 1024 / 1024, saved / results[(label, "dict")] * 100)
+        )
+    return results
+
+
+# Parses the names into volume objects the same way the script does,
+# without touching the files.
+def parse_names(names, root):
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        return upgrade_to_volume_class(
+            upgrade_to_file_class(names, root, test_mode=True), test_mode=True
+        )
+
+
+# Parses the corpus repeatedly until count names have been parsed.
+# Each repeat starts with cold caches unless warm is set, so
+# repeats measure the parser instead of the caches.
+def parse_corpus(corpus, count, root, warm=False):
+    for cache in list(cache_registry.values()):
+        clear_registered_cache(cache)
+
+    for start in range(0, count, len(corpus)):
+        if not warm:
+            for cache in list(cache_registry.values()):
+                clear_registered_cache(cache)
+        parse_names(corpus[: count - start], root)
+
+
+# Measures the parsing throughput over the tests.py corpus duplicated
+# to count names, and the functions the parsing time is spent in.
+def benchmark_parser(count, warm=False, top=25, output_path=None):
+    corpus = get_corpus_names()
+    root = os.path.join(ROOT_DIR, "benchmark_library")
+    mode = "warm" if warm else "cold"
+
+    print(
+        f"\nParsing {count} names from a corpus of {len(corpus)} names ({mode} caches)..."
+    )
+    start = time.perf_counter()
+    parse_corpus(corpus, count, root, warm)
+    elapsed = time.perf_counter() - start
+    print(f"\t{count / elapsed:,.0f} names/sec ({elapsed:.2f}s)")
+
+    # profile a second run for the per-function breakdown
+    profiler = cProfile.Profile()
+    profiler.runcall(parse_corpus, corpus, count, root, warm)
+    stats = pstats.Stats(profiler)
+    profiled_time = stats.total_tt
+
+    functions = []
+    regex_time = 0
+    for (file_name, line, function_name), (
+        primitive_calls,
+        calls,
+        total_time,
+        cumulative_time,
+        callers,
+    ) in stats.stats.items():
+        if "regex" in file_name or "_regex" in function_name:
+            regex_time += total_time
+        elif file_name == komga_cover_extractor.__file__:
+            functions.append(
+                {
+                    "function": function_name,
+                    "line": line,
+                    "calls": calls,
+                    "total_time": total_time,
+                    "cumulative_time": cumulative_time,
+                    "total_percent": total_time / profiled_time * 100,
+                }
+            )
+    functions.sort(key=lambda function: -function["cumulative_time"])
+
+    print(
+        f"\n\tTop {top} functions by cumulative time (profiled run: {profiled_time:.2f}s, {regex_time / profiled_time * 100:.1f}% in regex)"
+    )
+    print(f"\t{'function':<40} {'calls':>10} {'own s':>8} {'own %':>6} {'cum s':>8}")
+    for function in functions[:top]:
+        print(
+            f"\t{function['function']:<40} {function['calls']:>10} {function['total_time']:>8.3f} {function['total_percent']:>6.1f} {function['cumulative_time']:>8.3f}"
+        )
+
+    results = {
+        "script_version": script_version_text,
+        "python": sys.version.split()[0],
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "names": count,
+        "corpus_names": len(corpus),
+        "caches": mode,
+        "seconds": elapsed,
+        "names_per_second": count / elapsed,
+        "regex_percent": regex_time / profiled_time * 100,
+        "functions": functions,
+    }
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nSaved results to {output_path}")
+    return results
+
+
+# Imports the script in a fresh interpreter with -X importtime.
+# Returns the seconds the import took, the seconds of each package the
+# script imports and the lazily imported modules it loaded.
+def time_script_import():
+    lazy_modules = sorted(
+        {
+            value.module_name
+            for value in vars(komga_cover_extractor).values()
+            if isinstance(value, LazyImport)
+        }
+    )
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import komga_cover_extractor\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {lazy_modules!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, loaded = result.stdout.splitlines()[-2:]
+
+    packages = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        if name.strip() == "komga_cover_extractor":
+            packages["komga_cover_extractor (own code)"] = int(self_time) / 1_000_000
+        elif name.startswith("   ") and not name.startswith("    "):
+            # only the script's own imports, their imports are included in them
+            packages[name.strip()] = int(cumulative_time) / 1_000_000
+
+    return float(seconds), packages, [x for x in loaded.split(",") if x]
+
+
+# Measures how long importing the script takes, the same cost the addons pay,
+# and the packages that take the longest to import.
+def benchmark_startup(repeats=5, top=25, output_path=None):
+    print(f"\nImporting the script {repeats} times in a fresh interpreter...")
+    runs = [time_script_import() for _ in range(repeats)]
+    seconds = [run[0] for run in runs]
+    loaded = runs[-1][2]
+
+    # the median of each package over the runs
+    packages = {
+        name: statistics.median(run[1].get(name, 0) for run in runs)
+        for name in runs[-1][1]
+    }
+    packages = sorted(packages.items(), key=lambda package: -package[1])
+
+    print(
+        f"\tmedian: {statistics.median(seconds):.3f}s, min: {min(seconds):.3f}s, max: {max(seconds):.3f}s"
+    )
+    print(f"\tLazy imports loaded at startup: {', '.join(loaded) or 'none'}")
+    print(f"\n\tTop {top} packages by import time")
+    for name, package_seconds in packages[:top]:
+        print(f"\t{name:<40} {package_seconds:>8.3f}s")
+
+    results = {
+        "script_version": script_version_text,
+        "python": sys.version.split()[0],
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "repeats": repeats,
+        "seconds": seconds,
+        "median_seconds": statistics.median(seconds),
+        "lazy_imports_loaded": loaded,
+        "packages": dict(packages),
+    }
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nSaved results to {output_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the cover extractor.")
+    parser.add_argument(
+        "benchmark",
+        choices=["memory", "library", "parser", "startup"],
+        help="memory: slotted object memory, library: stage timings on a synthetic library, parser: file name parsing throughput, startup: script import time",
+    )
+    parser.add_argument(
+        "--volumes",
+        type=int,
+        default=100000,
+        help="The number of volumes in the memory benchmark's synthetic library.",
+    )
+    parser.add_argument(
+        "--names",
+        type=int,
+        default=100000,
+        help="The number of names the parser benchmark parses.",
+    )
+    parser.add_argument(
+        "--warm",
+        action="store_true",
+        help="Keeps the parser benchmark's caches warm between corpus repeats.",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=25,
+        help="The number of functions or packages shown in the parser and startup benchmarks' breakdowns.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=5,
+        help="The number of times the startup benchmark imports the script.",
+    )
+    parser.add_argument(
+        "--scales",
+        nargs="+",
+        default=["10x5", "50x10", "200x10"],
+        help="The library benchmark's scales as SERIESxVOLUMES.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Where the results are saved as JSON. (the library benchmark defaults to logs/benchmark_<timestamp>.json)",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark == "memory":
+        benchmark_memory(args.volumes)
+    elif args.benchmark == "library":
+        benchmark_library(
+            [tuple(int(x) for x in scale.lower().split("x")) for scale in args.scales],
+            args.output
+            or os.path.join(
+                LOGS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            ),
+        )
+    elif args.benchmark == "parser":
+        benchmark_parser(args.names, args.warm, args.top, args.output)
+    elif args.benchmark == "startup":
+        benchmark_startup(args.repeats, args.top, args.output)
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
 import argparse
+import atexit
 import cProfile
+import csv
 import hashlib
+import importlib
 import io
+import itertools
+import json
+import math
 import os
+import pstats
+import random
 import re
 import shutil
 import string
@@ -14,34 +22,64 @@ import tempfile
 import threading
 import time
 import traceback
+import tracemalloc
 import urllib.request
 import xml.etree.ElementTree as ET
 import zipfile
 from base64 import b64encode
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from difflib import SequenceMatcher
-from functools import lru_cache
+from functools import lru_cache, wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from posixpath import join
 from urllib.parse import urlparse
 
-import cv2
 import diskcache
-import filetype
-import numpy as np
-import py7zr
-import rarfile
+import psutil
 import regex as re
 import requests
 import scandir
-from bs4 import BeautifulSoup
-from discord_webhook import DiscordEmbed, DiscordWebhook
-from lxml import etree
 from PIL import Image
-from skimage.metrics import structural_similarity as ssim
-from titlecase import titlecase
 from unidecode import unidecode
-from watchdog.events import FileSystemEventHandler
-from watchdog.observers import Observer
+
+
+# A module, or a name within one, that's only imported when it's first used.
+# Keeps startup fast for short runs and the addons, which don't use most of them.
+class LazyImport:
+    def __init__(self, module_name, attribute_name=None):
+        self.module_name = module_name
+        self.attribute_name = attribute_name
+        self.value = None
+
+    def load(self):
+        if self.value is None:
+            value = importlib.import_module(self.module_name)
+            if self.attribute_name:
+                value = getattr(value, self.attribute_name)
+            self.value = value
+        return self.value
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+cv2 = LazyImport("cv2")
+np = LazyImport("numpy")
+py7zr = LazyImport("py7zr")
+rarfile = LazyImport("rarfile")
+etree = LazyImport("lxml.etree")
+BeautifulSoup = LazyImport("bs4", "BeautifulSoup")
+DiscordEmbed = LazyImport("discord_webhook", "DiscordEmbed")
+DiscordWebhook = LazyImport("discord_webhook", "DiscordWebhook")
+ssim = LazyImport("skimage.metrics", "structural_similarity")
+titlecase = LazyImport("titlecase", "titlecase")
+Observer = LazyImport("watchdog.observers", "Observer")
 
 # Get all the variables in settings.py
 import settings as settings_file
@@ -73,6 +111,13 @@ compress_image_option = False
 # Pass in via cli
 image_quality = 40
 
+# Images at or under this size in bytes, or JPEGs already saved at or under
+# the requested quality, are passed through untouched when compressing. (0 = no size limit)
+# Set in settings.py or passed in via cli.
+compress_image_skip_size = getattr(
+    settings_file, "compress_image_skip_size", 150 * 1024
+)
+
 # Stat-related variables
 image_count = 0
 errors = []
@@ -100,12 +145,59 @@ release_groups = []
 # Used when renaming files where it has a matching publisher.
 publishers = []
 
+
+# An insertion-ordered set with the list methods used by the tracking lists below,
+# (transferred files, moved files, checked series, etc.) so checking
+# if an item is tracked doesn't scan the whole list.
+class TrackedSet:
+    def __init__(self, items=None):
+        self.items = dict.fromkeys(items or [])
+
+    def append(self, item):
+        self.items[item] = None
+
+    def extend(self, items):
+        self.items.update(dict.fromkeys(items))
+
+    def remove(self, item):
+        if item not in self.items:
+            raise ValueError(f"{item} is not in TrackedSet")
+        del self.items[item]
+
+    def discard(self, item):
+        self.items.pop(item, None)
+
+    def clear(self):
+        self.items.clear()
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __add__(self, other):
+        return list(self.items) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self.items)
+
+    def __str__(self):
+        return f"TrackedSet({list(self.items)})"
+
+    def __repr__(self):
+        return str(self)
+
+
 # A quick and dirty fix to avoid non-processed files from
 # being moved over to the existing library. Will be removed in the future.
-processed_files = []
+processed_files = TrackedSet()
 
 # Any files moved to the existing library. Used for triggering a library scan in komga.
-moved_files = []
+moved_files = TrackedSet()
 
 # The script's root directory
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -177,10 +269,7 @@ image_extensions = {".jpg", ".jpeg", ".png", ".tbn", ".webp"}
 file_formats = ["chapter", "volume"]
 
 # Stores all the new series paths for series that were added to an existing library
-moved_folders = []
-
-# Profiles the execution - for dev use
-profile_code = ""
+moved_folders = TrackedSet()
 
 # get all of the non-callable variables
 settings = [
@@ -204,12 +293,35 @@ class LibraryType:
         self.must_not_contain = must_not_contain
         self.match_percentage = match_percentage
 
+        # The rules are compiled once, as they're checked against every file
+        self.compiled_must_contain = [
+            re.compile(regex, re.IGNORECASE) for regex in must_contain
+        ]
+        self.compiled_must_not_contain = [
+            re.compile(regex, re.IGNORECASE) for regex in must_not_contain
+        ]
+
+    # Checks if the file matches the library type's rules
+    def matches(self, file, extension):
+        return (
+            extension in self.extensions
+            and all(regex.search(file) for regex in self.compiled_must_contain)
+            and not any(regex.search(file) for regex in self.compiled_must_not_contain)
+        )
+
     # Convert the object to a string representation
     def __str__(self):
         return f"LibraryType(name={self.name}, extensions={self.extensions}, must_contain={self.must_contain}, must_not_contain={self.must_not_contain}, match_percentage={self.match_percentage})"
 
 
 class IdentifierResult:
+    __slots__ = (
+        "series_name",
+        "identifiers",
+        "path",
+        "matches",
+    )
+
     def __init__(self, series_name, identifiers, path, matches):
         self.series_name = series_name
         self.identifiers = identifiers
@@ -221,6 +333,14 @@ class IdentifierResult:
             return self.series_name == other.series_name and self.path == other.path
         return False
 
+    # Restores identifiers cached before the class used __slots__,
+    # which were pickled with a __dict__ instead.
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for key, value in state.items():
+            setattr(self, key, value)
+
 
 class CacheManager:
     def __init__(self, cache_dir):
@@ -309,11 +429,831 @@ class CacheManager:
         times[path] = time
         self.cache['mod_times'] = times
 
+    # Epub descriptors are stored under their own key per file,
+    # and are only valid for the size and mod time they were parsed at.
+    def get_epub_descriptor(self, path, size, mod_time):
+        cached = self.cache.get(('epub_descriptor', path))
+        if cached and cached[0] == size and cached[1] == mod_time:
+            return cached[2]
+        return None
+
+    def set_epub_descriptor(self, path, size, mod_time, descriptor):
+        self.cache[('epub_descriptor', path)] = (size, mod_time, descriptor)
+
+    # Persisted in-memory cache values are stored per cache,
+    # and are only valid for the fingerprint they were saved with.
+    def get_memo(self, name, fingerprint):
+        cached = self.cache.get(('memo', name))
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        return None
+
+    def set_memo(self, name, fingerprint, items):
+        self.cache[('memo', name)] = (fingerprint, items)
+
+    # The volume numbers parsed from a library folder,
+    # only valid for the folder mod time and settings they were parsed with.
+    def get_volume_index(self, root, fingerprint, mod_time):
+        cached = self.cache.get(('volume_index', root))
+        if cached and cached[0] == fingerprint and cached[1] == mod_time:
+            return cached[2]
+        return None
+
+    def set_volume_index(self, root, fingerprint, mod_time, volume_numbers):
+        self.cache[('volume_index', root)] = (fingerprint, mod_time, volume_numbers)
+
+    # Removes the volume numbers cached for folders that no longer exist,
+    # so deleted and renamed series don't stay in the cache forever.
+    def prune_volume_indexes(self):
+        for key in list(self.cache.iterkeys()):
+            if (
+                isinstance(key, tuple)
+                and key[0] == "volume_index"
+                and not os.path.isdir(key[1])
+            ):
+                self.cache.delete(key)
+
 
 # Initialize CacheManager
 cache_manager = CacheManager(os.path.join(LOGS_DIR, "cache"))
 
 
+# The hit/miss stats of a cache, in the same shape as lru_cache's cache_info()
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+# A bounded in-memory LRU memo that keeps track of its hits and misses,
+# so the effectiveness of the cache can be reported at the end of a run.
+class BoundedMemo:
+    def __init__(self, maxsize=3500):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns (True, value) on a hit, (False, None) on a miss
+    def lookup(self, key):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return True, self.data[key]
+        self.misses += 1
+        return False, None
+
+    def store(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while self.maxsize and len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+    def cache_clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+
+# Every in-memory cache registered through registered_cache()
+# or register_cache(), keyed by name.
+cache_registry = {}
+
+# The hits and misses of registered caches from before they were last cleared,
+# keyed by name, so clearing a cache mid-run doesn't lose its stats.
+cleared_cache_stats = {}
+
+# The persistable caches, as BoundedMemo objects keyed by cache name, whose values
+# are saved to and loaded from the CacheManager when persist_caches is enabled.
+persistable_caches = {}
+
+# Whether the persisted cache values have been loaded this session
+persisted_caches_loaded = False
+
+
+# The cache settings, with their defaults for a settings.py from before they were added.
+default_cache_size = getattr(settings_file, "default_cache_size", 25000)
+cache_sizes = getattr(settings_file, "cache_sizes", {})
+persist_caches = getattr(settings_file, "persist_caches", False)
+
+
+# Returns the configured size of the named cache from settings.
+# (None = unlimited)
+def get_cache_size(name, default=None):
+    size = cache_sizes.get(name, default if default is not None else default_cache_size)
+    return size if size and size > 0 else None
+
+
+# Adds an existing cache (anything with cache_info() and cache_clear())
+# to the cache registry.
+def register_cache(name, cache):
+    cache_registry[name] = cache
+    return cache
+
+
+# Decorator that wraps the function in an lru_cache sized from settings and
+# registers it under the function's name.
+#
+# Persistable caches must be pure functions of their (picklable) arguments.
+# When persist_caches is enabled they're kept in a BoundedMemo instead,
+# so its values can be saved between runs.
+def registered_cache(maxsize=None, persistable=False):
+    def decorator(func):
+        name = func.__name__
+        size = get_cache_size(name, maxsize)
+
+        if not persistable or not persist_caches:
+            return register_cache(name, lru_cache(maxsize=size)(func))
+
+        memo = persistable_caches.setdefault(name, BoundedMemo(size))
+
+        @wraps(func)
+        def cached(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+            found, result = memo.lookup(key)
+            if not found:
+                result = func(*args, **kwargs)
+                memo.store(key, result)
+            return result
+
+        cached.cache_info = memo.cache_info
+        cached.cache_clear = memo.cache_clear
+        return register_cache(name, cached)
+
+    return decorator
+
+
+# Clears a registered cache, keeping its stats for the end-of-run report.
+def clear_registered_cache(cache):
+    info = cache.cache_info()
+    for name, registered in cache_registry.items():
+        if registered is cache:
+            hits, misses = cleared_cache_stats.get(name, (0, 0))
+            cleared_cache_stats[name] = (hits + info.hits, misses + info.misses)
+            break
+    cache.cache_clear()
+
+
+# The fingerprint persisted caches are stored with, so they're discarded
+# whenever the script version or any setting changes.
+def get_cache_fingerprint():
+    values = [(setting, repr(getattr(settings_file, setting))) for setting in settings]
+    return hashlib.md5(repr((script_version, values)).encode("utf-8")).hexdigest()
+
+
+# Loads the persisted cache values saved by a previous run.
+def load_persisted_caches():
+    global persisted_caches_loaded
+
+    if not persist_caches or persisted_caches_loaded:
+        return
+
+    persisted_caches_loaded = True
+    fingerprint = get_cache_fingerprint()
+    loaded_count = 0
+
+    for name, memo in persistable_caches.items():
+        try:
+            items = cache_manager.get_memo(name, fingerprint)
+            if not items:
+                continue
+
+            for key, value in items:
+                memo.store(key, value)
+            loaded_count += len(memo)
+        except Exception as e:
+            send_message(
+                f"\nERROR in load_persisted_caches(): {e} with cache: {name}",
+                error=True,
+            )
+
+    if loaded_count:
+        print(f"\nLoaded {loaded_count} persisted cache entries.")
+
+
+# Saves the values computed by the persistable caches for the next run.
+def save_persisted_caches():
+    if not persist_caches:
+        return
+
+    fingerprint = get_cache_fingerprint()
+
+    for name, memo in persistable_caches.items():
+        try:
+            cache_manager.set_memo(name, fingerprint, list(memo.data.items()))
+        except Exception as e:
+            send_message(
+                f"\nERROR in save_persisted_caches(): {e} with cache: {name}",
+                error=True,
+            )
+
+
+# Returns the (name, hits, misses, cache_info) of each registered cache,
+# including the hits and misses from before the cache was cleared.
+def get_cache_stats():
+    rows = []
+    for name, cache in cache_registry.items():
+        info = cache.cache_info()
+        cleared_hits, cleared_misses = cleared_cache_stats.get(name, (0, 0))
+        rows.append(
+            (name, info.hits + cleared_hits, info.misses + cleared_misses, info)
+        )
+    return rows
+
+
+# Prints the hit rates of the registered caches.
+def print_cache_stats():
+    rows = [row for row in get_cache_stats() if row[1] or row[2]]
+
+    if not rows:
+        return
+
+    print("\nCache Stats:")
+    for name, hits, misses, info in sorted(rows, key=lambda row: -(row[1] + row[2])):
+        hit_rate = (hits / (hits + misses)) * 100
+        print(
+            f"\t{name}: {hits} hits, {misses} misses ({hit_rate:.1f}% hit rate, {info.currsize}/{info.maxsize or 'unlimited'} entries)"
+        )
+
+
+# The metrics recorded for a stage of main(), summed across runs.
+# Nested stages are included in the metrics of the stage that called them.
+class StageMetrics:
+    __slots__ = (
+        "name",
+        "runs",
+        "wall_time",
+        "last_wall_time",
+        "cpu_time",
+        "files",
+        "bytes_read",
+        "cache_hits",
+        "cache_misses",
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.wall_time = 0.0
+        self.last_wall_time = 0.0
+        self.cpu_time = 0.0
+        self.files = 0
+        self.bytes_read = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+# The metrics of each stage that has run, by stage name
+stage_metrics = {}
+
+# The number of files upgraded to file objects, used to count
+# the files each stage processed.
+processed_file_count = 0
+
+# The metric descriptions written for each stage, as
+# (metric name, StageMetrics attribute, type, help text)
+stage_metric_fields = [
+    ("stage_runs_total", "runs", "counter", "Times the stage has run."),
+    (
+        "stage_wall_seconds_total",
+        "wall_time",
+        "counter",
+        "Wall-clock time spent in the stage.",
+    ),
+    (
+        "stage_last_wall_seconds",
+        "last_wall_time",
+        "gauge",
+        "Wall-clock time of the most recent run of the stage.",
+    ),
+    ("stage_cpu_seconds_total", "cpu_time", "counter", "CPU time spent in the stage."),
+    ("stage_files_total", "files", "counter", "Files processed by the stage."),
+    ("stage_read_bytes_total", "bytes_read", "counter", "Bytes read by the stage."),
+    (
+        "stage_cache_hits_total",
+        "cache_hits",
+        "counter",
+        "Registered cache hits during the stage.",
+    ),
+    (
+        "stage_cache_misses_total",
+        "cache_misses",
+        "counter",
+        "Registered cache misses during the stage.",
+    ),
+]
+
+
+# Returns the bytes read by the process so far, or 0 when the
+# platform doesn't report it.
+def get_process_bytes_read():
+    try:
+        io_counters = psutil.Process().io_counters()
+        return getattr(io_counters, "read_chars", io_counters.read_bytes)
+    except (AttributeError, psutil.Error):
+        return 0
+
+
+# Takes a snapshot of the counters a stage is measured by.
+def get_stage_counters():
+    cache_stats = get_cache_stats()
+    return (
+        time.perf_counter(),
+        time.process_time(),
+        processed_file_count,
+        get_process_bytes_read(),
+        sum(row[1] for row in cache_stats),
+        sum(row[2] for row in cache_stats),
+    )
+
+
+# The profiler of the stage being profiled. Stages called while it runs
+# are included in its profile instead of being profiled separately.
+active_stage_profiler = None
+
+# The peak traced memory of each running stage, innermost last
+stage_memory_peaks = []
+
+# The highest peak traced memory of each stage, by stage name
+stage_peak_memory = {}
+
+
+# Sets the stages to profile, from a list or a comma separated string,
+# and whether to trace the peak memory of each stage.
+def set_profiling(stages, memory=False):
+    global profile_stages, profile_memory
+
+    if isinstance(stages, str):
+        stages = stages.split(",")
+
+    profile_stages = [stage.strip() for stage in stages if stage.strip()]
+    profile_memory = memory
+
+
+# Checks if the stage was chosen for profiling,
+# "all" chooses every stage besides main.
+def is_profiled_stage(name):
+    return name in profile_stages or ("all" in profile_stages and name != "main")
+
+
+# Gets the collapsed stacks of a profile, as "caller;callee" -> seconds.
+#
+# cProfile only records caller -> callee edges, so a function's time is split
+# across the paths that reach it in proportion to each edge's cumulative time.
+#
+# Paths under min_share of the profile's total time aren't followed, and only
+# the max_stacks slowest stacks are kept, so large profiles stay readable.
+def get_collapsed_stacks(stats, min_share=0.001, max_stacks=5000):
+    min_seconds = max(stats.total_tt * min_share, 0.000001)
+    callees = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller][function] = edge
+
+    def get_label(function):
+        file_name, line, function_name = function
+        if file_name == "~":
+            return function_name
+        return f"{function_name} ({os.path.basename(file_name)}:{line})"
+
+    stacks = defaultdict(float)
+
+    def add_stacks(function, stack, share):
+        _, _, total_time, _, _ = stats.stats[function]
+        stack = stack + [get_label(function)]
+        if total_time * share >= min_seconds:
+            stacks[";".join(stack)] += total_time * share
+
+        for callee, edge in callees[function].items():
+            callee_time = stats.stats[callee][3]
+            edge_share = edge[3] * share / callee_time if callee_time else 0
+            if (
+                callee not in visiting
+                and edge_share
+                and callee_time * edge_share >= min_seconds
+            ):
+                visiting.add(callee)
+                add_stacks(callee, stack, edge_share)
+                visiting.remove(callee)
+
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            visiting = {function}
+            add_stacks(function, [], 1)
+
+    if max_stacks and len(stacks) > max_stacks:
+        slowest = sorted(stacks.items(), key=lambda item: item[1], reverse=True)
+        stacks = dict(slowest[:max_stacks])
+
+    return stacks
+
+
+# Writes the profile of a stage to logs/profiles as a .pstats file
+# and a collapsed-stack file (for flamegraph.pl or speedscope).
+def write_stage_profile(name, profiler):
+    profiles_dir = os.path.join(LOGS_DIR, "profiles")
+    file_name = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+    try:
+        os.makedirs(profiles_dir, exist_ok=True)
+        stats = pstats.Stats(profiler)
+
+        stats_path = os.path.join(profiles_dir, f"{file_name}.pstats")
+        stats.dump_stats(stats_path)
+
+        collapsed_path = os.path.join(profiles_dir, f"{file_name}.collapsed")
+        with open(collapsed_path, "w", encoding="utf-8") as f:
+            for stack, seconds in get_collapsed_stacks(stats).items():
+                f.write(f"{stack} {round(seconds * 1000000)}\n")
+
+        print(f"\n\tProfiled {name} in {stats.total_tt:.2f}s: {stats_path}")
+    except Exception as e:
+        send_message(f"\nERROR in write_stage_profile(): {e}", error=True)
+
+
+# Starts profiling the stage if it was chosen for profiling,
+# and starts tracing its peak memory if enabled.
+# Returns the stage's profiler, if any.
+def start_stage_profile(name):
+    global active_stage_profiler
+
+    profiler = None
+    if active_stage_profiler is None and is_profiled_stage(name):
+        profiler = cProfile.Profile()
+        active_stage_profiler = profiler
+        profiler.enable()
+
+    if profile_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif stage_memory_peaks:
+            # keep the peak of the calling stage before resetting it
+            stage_memory_peaks[-1] = max(
+                stage_memory_peaks[-1], tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+        stage_memory_peaks.append(0)
+
+    return profiler
+
+
+# Stops profiling the stage, writing out its profile and peak memory.
+def stop_stage_profile(name, profiler):
+    global active_stage_profiler
+
+    if profiler:
+        profiler.disable()
+        active_stage_profiler = None
+        write_stage_profile(name, profiler)
+
+    if profile_memory and stage_memory_peaks:
+        peak = max(stage_memory_peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if stage_memory_peaks:
+            stage_memory_peaks[-1] = max(stage_memory_peaks[-1], peak)
+        stage_peak_memory[name] = max(stage_peak_memory.get(name, 0), peak)
+        print(f"\tPeak traced memory in {name}: {peak / 1024 / 1024:.2f} MiB")
+
+
+# Profiles each call to the decorated stage when it's chosen for profiling.
+def profiled_stage(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = start_stage_profile(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stop_stage_profile(func.__name__, profiler)
+
+    return wrapper
+
+
+# The names of the running stages, innermost last
+running_stages = []
+
+
+# The bytes read, opens and seeks of the archive and file reads
+class IOStats:
+    __slots__ = ("bytes_read", "opens", "seeks")
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.opens = 0
+        self.seeks = 0
+
+
+# The I/O of the current run, by stage and by file
+io_stats_by_stage = defaultdict(IOStats)
+io_stats_by_file = defaultdict(IOStats)
+io_stats_lock = threading.Lock()
+
+
+# Records I/O against the running stage and the file.
+def record_io(path, bytes_read=0, opens=0, seeks=0, stage=None):
+    stage = stage or (running_stages[-1] if running_stages else "other")
+    with io_stats_lock:
+        for stats in (io_stats_by_stage[stage], io_stats_by_file[path]):
+            stats.bytes_read += bytes_read
+            stats.opens += opens
+            stats.seeks += seeks
+
+
+# A file opened for reading that records the bytes it reads and the seeks it
+# makes, which are added to the I/O stats when it's closed.
+# Can be passed to zipfile in place of a path.
+class CountingFile:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.stage = running_stages[-1] if running_stages else "other"
+        self.bytes_read = 0
+        self.seeks = 0
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self.file.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self.seeks += 1
+        return self.file.seek(offset, whence)
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+            record_io(self.path, self.bytes_read, 1, self.seeks, self.stage)
+
+    # everything else, such as tell() and name, comes from the file
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Opens a zip file over a CountingFile, so its reads are recorded.
+#
+# NOTE: py7zr rejects file objects, and rarfile needs the path to find the other
+# volumes of a multi-volume archive, so they're opened by path instead, and their
+# extractions are recorded with record_io() as one read of the whole archive.
+@contextmanager
+def open_zip(path, mode="r"):
+    with CountingFile(path) as f:
+        with zipfile.ZipFile(f, mode) as zip:
+            yield zip
+
+
+# Prints the I/O of each stage and the files that read the most
+# in this run, then resets the stats for the next run.
+def print_io_stats(top=10):
+    with io_stats_lock:
+        by_stage = sorted(io_stats_by_stage.items(), key=lambda x: -x[1].bytes_read)
+        by_file = sorted(io_stats_by_file.items(), key=lambda x: -x[1].bytes_read)
+        io_stats_by_stage.clear()
+        io_stats_by_file.clear()
+
+    if not by_stage:
+        return
+
+    print("\nI/O Stats:")
+    for stage, stats in by_stage:
+        print(
+            f"\t{stage}: {stats.bytes_read / 1024 / 1024:.2f} MiB read, {stats.opens} opens, {stats.seeks} seeks"
+        )
+
+    print(f"\n\tTop {min(top, len(by_file))} files by bytes read:")
+    for path, stats in by_file[:top]:
+        print(
+            f"\t\t{stats.bytes_read / 1024 / 1024:.2f} MiB, {stats.opens} opens, {stats.seeks} seeks: {path}"
+        )
+
+
+# A JSON-lines log of events, buffered in memory and appended
+# to the file in the logs folder in batches.
+class EventLog:
+    def __init__(self, file_name, buffer_size=500, flush_interval=10):
+        self.file_name = file_name
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+    def log(self, **event):
+        line = json.dumps(
+            {"time": datetime.now().isoformat(timespec="milliseconds"), **event},
+            ensure_ascii=False,
+        )
+        with self.lock:
+            self.buffer.append(line)
+            if (
+                len(self.buffer) >= self.buffer_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+
+        lines, self.buffer = self.buffer, []
+        try:
+            os.makedirs(LOGS_DIR, exist_ok=True)
+            file_path = os.path.join(LOGS_DIR, self.file_name)
+
+            # Once the log reaches its maximum size, it's moved to a .1 file,
+            # replacing the previous one, and a new log is started.
+            if (
+                log_file_events_max_size
+                and os.path.isfile(file_path)
+                and os.path.getsize(file_path) >= log_file_events_max_size
+            ):
+                os.replace(file_path, file_path + ".1")
+
+            with open(file_path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except Exception as e:
+            send_message(f"\nERROR in EventLog.flush(): {e}", error=True, log=False)
+
+
+# The per-file events of each run, flushed at the end of each run and on exit
+event_log = EventLog("events.jsonl")
+atexit.register(event_log.flush)
+
+
+# Logs an event for each file the decorated function handles, with the
+# running stage, the duration, the file's size, the action and the outcome.
+#
+# get_path gets the file's path from the function's arguments.
+# The outcome is "success" or "failed" from the function's result,
+# "done" when it has none, or "error" when it raised.
+def file_event(action, get_path=lambda *args, **kwargs: args[0]):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not log_to_file or not log_file_events:
+                return func(*args, **kwargs)
+
+            path = get_path(*args, **kwargs)
+            size = get_file_size(path)
+            outcome = "error"
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                outcome = (
+                    "done" if result is None else "success" if result else "failed"
+                )
+                return result
+            finally:
+                event_log.log(
+                    stage=running_stages[-1] if running_stages else None,
+                    action=action,
+                    path=path,
+                    outcome=outcome,
+                    duration=round(time.perf_counter() - start, 6),
+                    bytes=size,
+                )
+
+        return wrapper
+
+    return decorator
+
+
+# Records the wall time, cpu time, files processed, bytes read
+# and cache hits/misses of each call to the decorated stage,
+# and profiles it when it's chosen for profiling.
+def metered_stage(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = start_stage_profile(func.__name__)
+        start = get_stage_counters()
+        running_stages.append(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            running_stages.pop()
+            end = get_stage_counters()
+            wall_time, cpu_time, files, bytes_read, hits, misses = (
+                e - s for s, e in zip(start, end)
+            )
+
+            metrics = stage_metrics.setdefault(
+                func.__name__, StageMetrics(func.__name__)
+            )
+            metrics.runs += 1
+            metrics.wall_time += wall_time
+            metrics.last_wall_time = wall_time
+            metrics.cpu_time += cpu_time
+            metrics.files += files
+            metrics.bytes_read += bytes_read
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+            stop_stage_profile(func.__name__, profiler)
+
+    return wrapper
+
+
+# Renders the stage and cache metrics in the Prometheus text format.
+def render_metrics():
+    lines = []
+    metrics_list = list(stage_metrics.values())
+
+    for metric_name, field, metric_type, help_text in stage_metric_fields:
+        metric_name = f"komga_cover_extractor_{metric_name}"
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for metrics in metrics_list:
+            lines.append(
+                f'{metric_name}{{stage="{metrics.name}"}} {getattr(metrics, field)}'
+            )
+
+    cache_stats = get_cache_stats()
+    for metric_name, index, help_text in [
+        ("cache_hits_total", 1, "Hits of the registered cache."),
+        ("cache_misses_total", 2, "Misses of the registered cache."),
+    ]:
+        metric_name = f"komga_cover_extractor_{metric_name}"
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} counter")
+        for row in cache_stats:
+            lines.append(f'{metric_name}{{cache="{row[0]}"}} {row[index]}')
+
+    if stage_peak_memory:
+        metric_name = "komga_cover_extractor_stage_peak_memory_bytes"
+        lines.append(f"# HELP {metric_name} Peak traced memory during the stage.")
+        lines.append(f"# TYPE {metric_name} gauge")
+        for name, peak in list(stage_peak_memory.items()):
+            lines.append(f'{metric_name}{{stage="{name}"}} {peak}')
+
+    return "\n".join(lines) + "\n"
+
+
+# Writes the metrics to metrics.prom in the logs folder.
+# Written to a temporary file first, so a scraper never reads a partial file.
+def write_metrics_file():
+    if not log_to_file or not stage_metrics:
+        return
+
+    metrics_path = os.path.join(LOGS_DIR, "metrics.prom")
+    temp_path = f"{metrics_path}.tmp"
+    try:
+        os.makedirs(LOGS_DIR, exist_ok=True)
+        with open(temp_path, "w") as f:
+            f.write(render_metrics())
+        os.replace(temp_path, metrics_path)
+    except Exception as e:
+        send_message(f"\nERROR in write_metrics_file(): {e}", error=True)
+
+
+# Serves the metrics on the passed local port from a background thread.
+def start_metrics_server(port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # keep the request logs out of the console
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except OSError as e:
+        send_message(f"\nERROR in start_metrics_server(): {e}", error=True)
+        return None
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"\tServing metrics on http://127.0.0.1:{port}/metrics")
+    return server
+
+
+# The memo behind get_release_number_cache(), keyed by (file, chapter)
+release_number_memo = register_cache(
+    "get_release_number",
+    BoundedMemo(get_cache_size("get_release_number")),
+)
+
+
 # The Library Entertainment types
 library_types = [
     LibraryType(
@@ -511,8 +1451,8 @@ publisher_similarity_score = 0.9
 # Used to store the files and their associated dirs that have been marked as fully transferred
 # When using watchdog, this is used to prevent the script from
 # trying to process the same file multiple times.
-transferred_files = []
-transferred_dirs = []
+transferred_files = TrackedSet()
+transferred_dirs = TrackedSet()
 
 # The logo url for usage in the bookwalker_check discord output
 bookwalker_logo_url = "https://play-lh.googleusercontent.com/a7jUyjTxWrl_Kl1FkUSv2FHsSu3Swucpem2UIFDRbA1fmt5ywKBf-gcwe6_zalOqIR7V=w240-h480-rw"
@@ -565,6 +1505,46 @@ watchdog_discover_new_files_check_interval = 5
 # Slower network response times may require a higher value.
 watchdog_file_transferred_check_interval = 1
 
+# The sampling limits used when auto-classifying watchdog paths.
+# Files are sampled lazily, a few at random from folders picked at random,
+# and sampling stops as soon as the chapter/volume ratio and the common
+# extensions are decided at the thresholds with the given confidence.
+auto_classify_min_sample = 50
+auto_classify_max_sample = 2000
+auto_classify_files_per_folder = 5
+auto_classify_confidence_z = 2.576  # 99%
+
+# Writes the results of check_for_missing_volumes() to a report
+# in the logs folder. ("json", "csv", or "" for no report)
+missing_volumes_report_format = ""
+
+# Serves the per-stage metrics written to logs/metrics.prom
+# on this local port. (None to disable)
+# Set in settings.py or passed in via cli.
+metrics_port = getattr(settings_file, "metrics_port", None)
+
+# The stages to profile, by function name. Each profiled run writes a .pstats
+# file and a collapsed-stack file to logs/profiles.
+# ("main" profiles a whole run, "all" profiles every stage separately)
+# Set in settings.py or passed in via cli.
+profile_stages = getattr(settings_file, "profile_stages", [])
+
+# Traces the peak memory of each stage with tracemalloc. (slows down runs)
+# Set in settings.py or passed in via cli.
+profile_memory = getattr(settings_file, "profile_memory", False)
+
+# Logs an event for each file handled in a run to logs/events.jsonl,
+# with its stage, action, outcome, duration and size. (requires log_to_file)
+# Set in settings.py.
+log_file_events = getattr(settings_file, "log_file_events", True)
+
+# The size in bytes logs/events.jsonl can reach before it's moved
+# to logs/events.jsonl.1 and a new one is started. (0 = no limit)
+# Set in settings.py.
+log_file_events_max_size = getattr(
+    settings_file, "log_file_events_max_size", 10 * 1024 * 1024
+)
+
 # The libraries on the user's komga server.
 # Used for sending scan reqeusts after files have been moved over.
 komga_libraries = []
@@ -578,13 +1558,28 @@ move_new_series_to_library_toggle = False
 move_series_to_correct_library_toggle = False
 
 # Used in get_extra_from_group()
-publishers_joined = ""
-release_groups_joined = ""
+# (BracketedLiteralMatcher objects built from publishers.txt and release_groups.txt)
+publishers_matcher = None
+release_groups_matcher = None
 
 # Outputs the covers as WebP format
 # instead of jpg format.
 output_covers_as_webp = False
 
+# The quality used when transcoding extracted covers.
+# (image_quality is used instead when compress_image_option is enabled)
+# Set in settings.py or passed in via cli.
+cover_output_quality = getattr(settings_file, "cover_output_quality", 85)
+
+# The maximum width and height of extracted covers,
+# larger covers are downscaled to fit before being encoded. (0 = no limit)
+# Set in settings.py or passed in via cli.
+cover_max_width = getattr(settings_file, "cover_max_width", 0)
+cover_max_height = getattr(settings_file, "cover_max_height", 0)
+
+# The codecs extracted covers can be transcoded to, and their extensions
+cover_codec_extensions = {"JPEG": ".jpg", "WEBP": ".webp"}
+
 series_cover_path = ""
 
 # The cutoff image count limit for a file to be
@@ -612,6 +1607,14 @@ compiled_cover_patterns = [
 
 # Folder Class
 class Folder:
+    __slots__ = (
+        "root",
+        "dirs",
+        "basename",
+        "folder_name",
+        "files",
+    )
+
     def __init__(self, root, dirs, basename, folder_name, files):
         self.root = root
         self.dirs = dirs
@@ -629,6 +1632,19 @@ class Folder:
 
 # File Class
 class File:
+    __slots__ = (
+        "name",
+        "extensionless_name",
+        "basename",
+        "extension",
+        "root",
+        "path",
+        "extensionless_path",
+        "volume_number",
+        "file_type",
+        "header_extension",
+    )
+
     def __init__(
         self,
         name,
@@ -655,6 +1671,8 @@ class File:
 
 
 class Publisher:
+    __slots__ = ("from_meta", "from_name")
+
     def __init__(self, from_meta, from_name):
         self.from_meta = from_meta
         self.from_name = from_name
@@ -669,6 +1687,31 @@ class Publisher:
 
 # Volume Class
 class Volume:
+    __slots__ = (
+        "file_type",
+        "series_name",
+        "shortened_series_name",
+        "volume_year",
+        "volume_number",
+        "volume_part",
+        "index_number",
+        "release_group",
+        "name",
+        "extensionless_name",
+        "basename",
+        "extension",
+        "root",
+        "path",
+        "extensionless_path",
+        "extras",
+        "publisher",
+        "is_premium",
+        "subtitle",
+        "header_extension",
+        "multi_volume",
+        "is_one_shot",
+    )
+
     def __init__(
         self,
         file_type,
@@ -824,27 +1867,33 @@ def send_message(
 
 
 # Determines the files library type
+#
+# Each library type stops checking files as soon as its match percentage
+# has been reached, or can no longer be reached with the remaining files.
 def get_library_type(files, required_match_percentage=None):
+    if not files:
+        return None
+
+    file_count = len(files)
+    files_with_extensions = [(file, get_file_extension(file)) for file in files]
+
     for library_type in library_types:
+        match_percentage = required_match_percentage or library_type.match_percentage
         match_count = 0
-        for file in files:
-            extension = get_file_extension(file)
-            if (
-                extension in library_type.extensions
-                and all(
-                    re.search(regex, file, re.IGNORECASE)
-                    for regex in library_type.must_contain
-                )
-                and all(
-                    not re.search(regex, file, re.IGNORECASE)
-                    for regex in library_type.must_not_contain
-                )
-            ):
-                match_count += 1
 
-        match_percentage = required_match_percentage or library_type.match_percentage
-        if match_count / len(files) * 100 >= match_percentage:
+        if match_percentage <= 0:
             return library_type
+
+        for checked_count, (file, extension) in enumerate(files_with_extensions, 1):
+            if library_type.matches(file, extension):
+                match_count += 1
+                if match_count / file_count * 100 >= match_percentage:
+                    return library_type
+            elif (
+                match_count + (file_count - checked_count)
+            ) / file_count * 100 < match_percentage:
+                break
+
     return None
 
 
@@ -893,47 +1942,160 @@ def get_file_size(file_path):
         return None
 
 
-# Recursively gets all the folders in a directory
-def get_all_folders_recursively_in_dir(dir_path):
-    results = []
+# The orders iter_folders_recursively_in_dir can walk a directory tree in
+#   top_down: parents before their subfolders, in directory listing order
+#   deepest_first: subfolders before their parents
+#   sorted: parents before their subfolders, with subfolders visited by name
+folder_walk_orders = ["top_down", "deepest_first", "sorted"]
 
-    for root, dirs, files in scandir.walk(dir_path):
-        if root in download_folders + paths:
-            continue
 
-        folder_info = {"root": root, "dirs": dirs, "files": files}
+# Lazily yields all the folders in a directory, reading only as much
+# of the tree as the caller consumes.
+#
+# Callers that move, rename or delete folders while walking should
+# wrap the walk in list(), so it's read in full before the tree changes.
+def iter_folders_recursively_in_dir(dir_path, order="top_down"):
+    if order not in folder_walk_orders:
+        raise ValueError(f"Unknown folder walk order: {order}")
 
-        results.append(folder_info)
+    skipped_roots = set(download_folders + paths)
 
-    return results
+    for root, dirs, files in scandir.walk(dir_path, topdown=order != "deepest_first"):
+        if order == "sorted":
+            # sorting in place also sets the order the walk descends in
+            dirs.sort()
+
+        if root in skipped_roots:
+            continue
+
+        yield {"root": root, "dirs": dirs, "files": files}
 
 
 # Recursively gets all the files in a directory
 def get_all_files_in_directory(dir_path):
-    results = []
+    return list(iter_files_in_directory(dir_path))
+
+
+# Lazily yields the accepted files in a directory tree, reading only as
+# much of the tree as the caller consumes.
+def iter_files_in_directory(dir_path):
     for root, dirs, files in scandir.walk(dir_path):
         files = remove_hidden_files(files)
+        yield from remove_unaccepted_file_types(files, root, file_extensions)
+
+
+# Lazily yields a random sample of the accepted files in a directory tree,
+# up to files_per_dir random files from each folder. (None = all of them)
+#
+# Each folder read is picked at random from all the folders found so far,
+# so the sample is spread across the series folders instead of being
+# a prefix of the walk, while still only reading as much of the tree
+# as the caller consumes.
+def iter_sampled_files_in_directory(dir_path, files_per_dir=None, rng=random):
+    pending_dirs = [dir_path]
+
+    while pending_dirs:
+        index = rng.randrange(len(pending_dirs))
+        pending_dirs[index], pending_dirs[-1] = pending_dirs[-1], pending_dirs[index]
+        root = pending_dirs.pop()
+
+        try:
+            entries = list(scandir.scandir(root))
+        except OSError as e:
+            send_message(str(e), error=True)
+            continue
+
+        pending_dirs.extend(
+            entry.path for entry in entries if entry.is_dir(follow_symlinks=False)
+        )
+
+        files = remove_hidden_files(
+            [entry.name for entry in entries if entry.is_file()]
+        )
         files = remove_unaccepted_file_types(files, root, file_extensions)
-        results.extend(files)
-    return results
+        yield from rng.sample(files, min(len(files), files_per_dir or len(files)))
+
+
+# Returns the Wilson score interval of a proportion
+def get_wilson_interval(successes, total, z=auto_classify_confidence_z):
+    if not total:
+        return 0.0, 1.0
+
+    proportion = successes / total
+    denominator = 1 + z**2 / total
+    center = (proportion + z**2 / (2 * total)) / denominator
+    margin = (
+        z
+        * math.sqrt(proportion * (1 - proportion) / total + z**2 / (4 * total**2))
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+# Samples the passed files until their chapter/volume ratio is decided
+# at the passed thresholds, returning the sampled files and their chapter count.
+# The files should be in a random order, see iter_sampled_files_in_directory().
+#
+# The ratio is decided once the confidence interval of the chapter percentage
+# no longer straddles either threshold. (or the max sample size is reached)
+# When an extension_threshold is passed, the percentage of each extension
+# must also be decided against it, so the common extensions can be taken
+# from the sample.
+def sample_file_types(
+    files,
+    chapter_threshold,
+    volume_threshold,
+    min_sample=auto_classify_min_sample,
+    max_sample=auto_classify_max_sample,
+    z=auto_classify_confidence_z,
+    extension_threshold=None,
+):
+    sampled_files = []
+    chapter_count = 0
+    extension_counts = defaultdict(int)
+
+    for file in files:
+        sampled_files.append(file)
+        if not contains_volume_keywords(file) and contains_chapter_keywords(file):
+            chapter_count += 1
+        extension_counts[get_file_extension(file)] += 1
+
+        total = len(sampled_files)
+        if max_sample and total >= max_sample:
+            break
+
+        if total >= min_sample:
+            intervals = [
+                (get_wilson_interval(chapter_count, total, z), boundary)
+                for boundary in [chapter_threshold, 1 - volume_threshold]
+            ]
+            if extension_threshold:
+                intervals.extend(
+                    (get_wilson_interval(count, total, z), extension_threshold)
+                    for count in extension_counts.values()
+                )
+
+            if all(not (low < boundary < high) for (low, high), boundary in intervals):
+                break
+
+    return sampled_files, chapter_count
 
 
 # Resursively gets all files in a directory for watchdog
 def get_all_files_recursively_in_dir_watchdog(dir_path):
-    results = []
+    return list(iter_files_recursively_in_dir_watchdog(dir_path))
+
+
+# Lazily yields all files in a directory for watchdog
+def iter_files_recursively_in_dir_watchdog(dir_path):
+    include_images = not compress_image_option and (
+        download_folders and dir_path in paths
+    )
     for root, dirs, files in scandir.walk(dir_path):
-        files = remove_hidden_files(files)
-        for file in files:
+        for file in remove_hidden_files(files):
             file_path = os.path.join(root, file)
-            if file_path not in results:
-                extension = get_file_extension(file_path)
-                if extension not in image_extensions:
-                    results.append(file_path)
-                elif not compress_image_option and (
-                    download_folders and dir_path in paths
-                ):
-                    results.append(file_path)
-    return results
+            if include_images or get_file_extension(file_path) not in image_extensions:
+                yield file_path
 
 
 # Generates a folder object for a given root
@@ -947,10 +2109,17 @@ def create_folder_obj(root, dirs=None, files=None):
     )
 
 
-class Handler(FileSystemEventHandler):
+class Handler:
     def __init__(self, lock):
         self.lock = lock
 
+    # Called by the observer for every event, only created files and folders
+    # are handled. Stands in for watchdog's FileSystemEventHandler, so watchdog
+    # is only imported when the watcher runs.
+    def dispatch(self, event):
+        if event.event_type == "created":
+            self.on_created(event)
+
     def on_created(self, event):
         with self.lock:
             start_time = time.time()
@@ -1054,10 +2223,8 @@ class Handler(FileSystemEventHandler):
                     all_files_transferred = True
                     print(f"\nTotal files: {len(files)}")
 
-                    for file in files:
-                        print(
-                            f"\t[{files.index(file) + 1}/{len(files)}] {os.path.basename(file)}"
-                        )
+                    for file_index, file in enumerate(files, start=1):
+                        print(f"\t[{file_index}/{len(files)}] {os.path.basename(file)}")
 
                         if file in transferred_files:
                             print("\t\t-already transferred")
@@ -1069,7 +2236,10 @@ class Handler(FileSystemEventHandler):
                             print("\t\t-fully transferred")
                             transferred_files.append(file)
                             dir_path = os.path.dirname(file)
-                            if dir_path not in download_folders + transferred_dirs:
+                            if (
+                                dir_path not in download_folders
+                                and dir_path not in transferred_dirs
+                            ):
                                 transferred_dirs.append(os.path.dirname(file))
                         elif not os.path.isfile(file):
                             print("\t\t-file no longer exists")
@@ -1113,18 +2283,15 @@ class Handler(FileSystemEventHandler):
                 print("\nAll files are transferred.")
 
                 # Make sure all items are a folder object
-                transferred_dirs = [
+                transferred_dirs = TrackedSet(
                     create_folder_obj(x) if not isinstance(x, Folder) else x
                     for x in transferred_dirs
-                ]
+                )
 
             except Exception as e:
                 send_message(f"Error with watchdog on_any_event(): {e}", error=True)
 
-            if profile_code == "main()":
-                cProfile.run(profile_code, sort="cumtime")
-            else:
-                main()
+            main()
 
             end_time = time.time()
             minute_keyword = ""
@@ -1249,15 +2416,17 @@ def process_path(path, paths_with_types, paths, is_download_folders=False):
         CHAPTER_THRESHOLD = 0.9  # 90%
         VOLUME_THRESHOLD = 0.9  # 90%
 
-        files = get_all_files_in_directory(path_str)
+        # Only as much of the tree is read as is needed to decide the type
+        files, chapter_count = sample_file_types(
+            iter_sampled_files_in_directory(path_str, auto_classify_files_per_folder),
+            CHAPTER_THRESHOLD,
+            VOLUME_THRESHOLD,
+            extension_threshold=COMMON_EXTENSION_THRESHOLD,
+        )
 
         if files:
             print("\t\t\t- attempting auto-classification...")
-            print(f"\t\t\t\t- got {len(files)} files.")
-            if len(files) >= 100:
-                print("\t\t\t\t\t- trimming files to 75%...")
-                files = files[: int(len(files) * 0.75)]
-                print(f"\t\t\t\t\t- trimmed to {len(files)} files.")
+            print(f"\t\t\t\t- sampled {len(files)} files.")
 
             print("\t\t\t\t- getting file extensions:")
             all_extensions = [get_file_extension(file) for file in files]
@@ -1289,21 +2458,8 @@ def process_path(path, paths_with_types, paths, is_download_folders=False):
                 print(f"\t\t\t\t\t- path extensions: {path_extensions}")
 
             print("\t\t\t\t- getting path types:")
-            all_types = [
-                (
-                    "chapter"
-                    if (
-                        not contains_volume_keywords(file)
-                        and contains_chapter_keywords(file)
-                    )
-                    else "volume"
-                )
-                for file in files
-            ]
-
-            chapter_count = all_types.count("chapter")
-            volume_count = all_types.count("volume")
-            total_files = len(all_types)
+            total_files = len(files)
+            volume_count = total_files - chapter_count
 
             print(f"\t\t\t\t\t- chapter count: {chapter_count}")
             print(f"\t\t\t\t\t- volume count: {volume_count}")
@@ -1494,6 +2650,11 @@ def parse_my_args():
         help="The quality of the compressed cover images.",
         required=False,
     )
+    parser.add_argument(
+        "--compress_skip_size",
+        help="Images at or under this size in bytes are left as is when compressing. (0 = no size limit)",
+        required=False,
+    )
     parser.add_argument(
         "-bwk_whs",
         "--bookwalker_webhook_urls",
@@ -1535,6 +2696,36 @@ def parse_my_args():
         help="Outputs the covers as WebP format instead of jpg format.",
         required=False,
     )
+    parser.add_argument(
+        "--cover_quality",
+        help="The quality used when transcoding the extracted covers.",
+        required=False,
+    )
+    parser.add_argument(
+        "--cover_max_size",
+        help="The maximum size of the extracted covers as WIDTHxHEIGHT, larger covers are downscaled. EX: 800x1200",
+        required=False,
+    )
+    parser.add_argument(
+        "--missing_volumes_report",
+        help="Writes the missing volumes found by check_for_missing_volumes to a json or csv report in the logs folder.",
+        required=False,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Comma separated stages to profile into the logs folder. EX: main or extract_covers,check_for_existing_series or all",
+        required=False,
+    )
+    parser.add_argument(
+        "--profile_memory",
+        help="Traces the peak memory of each stage with tracemalloc.",
+        required=False,
+    )
+    parser.add_argument(
+        "--metrics_port",
+        help="Serves the per-stage metrics in the Prometheus text format on this local port.",
+        required=False,
+    )
 
     parser = parser.parse_args()
 
@@ -1636,6 +2827,43 @@ def parse_my_args():
         output_covers_as_webp = parse_bool_argument(parser.output_covers_as_webp)
     print(f"\toutput_covers_as_webp: {output_covers_as_webp}")
 
+    if parser.cover_quality:
+        global cover_output_quality
+        if parser.cover_quality.isdigit():
+            cover_output_quality = int(parser.cover_quality)
+    print(f"\tcover_quality: {cover_output_quality}")
+
+    if parser.cover_max_size:
+        global cover_max_width, cover_max_height
+        max_size = parser.cover_max_size.lower().split("x")
+        if len(max_size) == 2 and all(x.strip().isdigit() for x in max_size):
+            cover_max_width, cover_max_height = (int(x) for x in max_size)
+    print(f"\tcover_max_size: {cover_max_width}x{cover_max_height}")
+
+    if parser.missing_volumes_report:
+        global missing_volumes_report_format
+        if parser.missing_volumes_report.lower() in ["json", "csv"]:
+            missing_volumes_report_format = parser.missing_volumes_report.lower()
+    print(f"\tmissing_volumes_report: {missing_volumes_report_format}")
+
+    if parser.metrics_port:
+        global metrics_port
+        if parser.metrics_port.isdigit():
+            metrics_port = int(parser.metrics_port)
+    print(f"\tmetrics_port: {metrics_port}")
+
+    if parser.profile or parser.profile_memory:
+        set_profiling(
+            parser.profile if parser.profile else profile_stages,
+            (
+                parse_bool_argument(parser.profile_memory)
+                if parser.profile_memory
+                else profile_memory
+            ),
+        )
+    print(f"\tprofile: {profile_stages}")
+    print(f"\tprofile_memory: {profile_memory}")
+
     if not parser.paths and not parser.download_folders:
         print("No paths or download folders were passed to the script.")
         print("Exiting...")
@@ -1672,6 +2900,11 @@ def parse_my_args():
         image_quality = int(parser.compress_quality)
     print(f"\tcompress_quality: {image_quality}")
 
+    if parser.compress_skip_size:
+        global compress_image_skip_size
+        compress_image_skip_size = int(parser.compress_skip_size)
+    print(f"\tcompress_skip_size: {compress_image_skip_size}")
+
     if parser.bookwalker_webhook_urls is not None:
         global bookwalker_webhook_urls
         for url in parser.bookwalker_webhook_urls:
@@ -1775,12 +3008,90 @@ def set_num_as_float_or_int(volume_number, silent=False):
     return volume_number
 
 
+# The standard JPEG luminance quantization table (ITU-T T.81, Annex K),
+# the quality of a JPEG is estimated from how its own table is scaled against it.
+jpeg_standard_luminance_table = (
+    (16, 11, 10, 16, 24, 40, 51, 61),
+    (12, 12, 14, 19, 26, 58, 60, 55),
+    (14, 13, 16, 24, 40, 57, 69, 56),
+    (14, 17, 22, 29, 51, 87, 80, 62),
+    (18, 22, 37, 56, 68, 109, 103, 77),
+    (24, 35, 55, 64, 81, 104, 113, 92),
+    (49, 64, 78, 87, 103, 121, 120, 101),
+    (72, 92, 95, 98, 112, 100, 103, 99),
+)
+jpeg_standard_luminance_sum = sum(map(sum, jpeg_standard_luminance_table))
+
+
+# Estimates the quality a JPEG was saved at from its luminance quantization table.
+# Only the marker headers and the DQT segment are read from the file object.
+# Returns None if it isn't a JPEG or no luminance table was found.
+def get_jpeg_quality(file_obj):
+    try:
+        if file_obj.read(2) != b"\xff\xd8":
+            return None
+
+        while True:
+            marker = file_obj.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+
+            # Start of scan or end of image, no table before the image data
+            if marker[1] in (0xDA, 0xD9):
+                return None
+
+            length = struct.unpack(">H", file_obj.read(2))[0]
+
+            if marker[1] != 0xDB:
+                file_obj.seek(length - 2, 1)
+                continue
+
+            segment = file_obj.read(length - 2)
+            while segment:
+                precision, table_id = segment[0] >> 4, segment[0] & 0x0F
+                table_size = 128 if precision else 64
+                table = segment[1 : table_size + 1]
+                if precision:
+                    table = struct.unpack(">64H", table)
+
+                if table_id == 0:
+                    scale = sum(table) * 100 / jpeg_standard_luminance_sum
+                    quality = (200 - scale) / 2 if scale <= 100 else 5000 / scale
+                    return max(1, min(100, round(quality)))
+
+                segment = segment[table_size + 1 :]
+    except (struct.error, IndexError, OSError):
+        return None
+
+
+# Determines if an image is already compressed enough that re-encoding it
+# at the passed quality would only waste time and degrade it further.
+def is_image_compressed_enough(image_path=None, raw_data=None, quality=image_quality):
+    size = len(raw_data) if raw_data else get_file_size(image_path)
+    if size is None:
+        return False
+
+    if compress_image_skip_size and size <= compress_image_skip_size:
+        return True
+
+    with io.BytesIO(raw_data) if raw_data else open(image_path, "rb") as file_obj:
+        jpeg_quality = get_jpeg_quality(file_obj)
+
+    return jpeg_quality is not None and jpeg_quality <= quality
+
+
 # Compresses an image and saves it to a file or returns the compressed image data.
 def compress_image(image_path, quality=60, to_jpg=False, raw_data=None):
     new_filename = None
     buffer = None
     save_format = "JPEG"
 
+    # Pass the image through untouched if it's already compressed enough
+    if is_image_compressed_enough(
+        image_path if not raw_data else None, raw_data, quality
+    ):
+        return image_path if not raw_data else raw_data
+
     # Load the image from the file or raw data
     image = Image.open(image_path if not raw_data else io.BytesIO(raw_data))
 
@@ -1813,12 +3124,96 @@ def compress_image(image_path, quality=60, to_jpg=False, raw_data=None):
         # Log the error and continue
         send_message(f"Failed to compress image {image_path}: {e}", error=True)
 
-    # Remove the original file if it's a PNG that was converted to JPG
-    if to_jpg and ext.lower() == ".jpg" and os.path.isfile(image_path):
-        os.remove(image_path)
+    # Remove the original file if it's a PNG that was converted to JPG
+    if to_jpg and ext.lower() == ".jpg" and os.path.isfile(image_path):
+        os.remove(image_path)
+
+    # Return the path to the compressed image file, or the compressed image data
+    return new_filename if not raw_data else buffer.getvalue()
+
+
+# Determines if extracted covers need to be transcoded before being written
+def should_transcode_covers():
+    return bool(
+        output_covers_as_webp
+        or compress_image_option
+        or cover_max_width
+        or cover_max_height
+    )
+
+
+# Transcodes the raw image data into the passed codec ("JPEG" or "WEBP"),
+# or the codec it's already in when None is passed, downscaling it to fit
+# within max_size first, and returns the encoded data.
+# Data that is already in the codec and fits is returned as is, unless forced,
+# in which case it's only returned as is if it's already compressed enough.
+def transcode_image(raw_data, codec="JPEG", quality=85, max_size=(0, 0), force=False):
+    with Image.open(io.BytesIO(raw_data)) as image:
+        codec = codec or image.format
+        max_width = max_size[0] or image.width
+        max_height = max_size[1] or image.height
+        fits = image.width <= max_width and image.height <= max_height
+
+        if (
+            fits
+            and image.format == codec
+            and (
+                not force
+                or is_image_compressed_enough(raw_data=raw_data, quality=quality)
+            )
+        ):
+            return raw_data
+
+        if not fits:
+            # Let the JPEG decoder downscale while decoding,
+            # then finish with a fast resampling filter.
+            image.draft("RGB", (max_width, max_height))
+            image.thumbnail((max_width, max_height), Image.Resampling.BILINEAR)
+
+        if codec == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif codec == "WEBP" and image.mode not in ("RGB", "RGBA"):
+            image = image.convert(
+                "RGBA"
+                if "A" in image.getbands() or "transparency" in image.info
+                else "RGB"
+            )
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=codec, quality=quality, optimize=True)
+        return buffer.getvalue()
+
+
+# The process umask, which can only be read by setting it, so it's read
+# once at import, before any threads are started that could create files
+# while it's briefly set to 0.
+process_umask = os.umask(0)
+os.umask(process_umask)
+
 
-    # Return the path to the compressed image file, or the compressed image data
-    return new_filename if not raw_data else buffer.getvalue()
+# Writes the data to the file path through a hidden temporary file
+# in the same directory, which then replaces the file path in one step.
+# The file keeps the mode of the file it replaces, otherwise it gets the
+# mode open() would give it, as mkstemp() creates it readable only by us.
+def write_file_atomically(file_path, data):
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path) or None, prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o666 & ~process_umask
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+        raise
 
 
 # Check the text file line by line for the passed message
@@ -1829,6 +3224,37 @@ def check_text_file_for_message(text_file, message):
         return any(line.strip() == message.strip() for line in f)
 
 
+# The lines of the log files checked for duplicate messages, by path,
+# as [file size, set of stripped lines]. A file is only read again
+# when its size no longer matches, i.e. something else wrote to it.
+log_line_index = {}
+
+
+# Checks if a log file contains the message, reading the file only once.
+def is_message_in_log_file(log_file_path, message):
+    entry = log_line_index.get(log_file_path)
+    size = os.path.getsize(log_file_path)
+
+    if not entry or entry[0] != size:
+        with open(log_file_path, "r") as f:
+            entry = [size, {line.strip() for line in f}]
+        log_line_index[log_file_path] = entry
+
+    return message.strip() in entry[1]
+
+
+# Adds a line written to a log file to its index, if it has one.
+def add_message_to_log_index(log_file_path, line, overwrite=False):
+    entry = log_line_index.get(log_file_path)
+    if not entry:
+        return
+
+    if overwrite:
+        entry[1] = set()
+    entry[1].add(line.strip())
+    entry[0] = os.path.getsize(log_file_path)
+
+
 # Adjusts discord embeds fields to fit the discord embed field limits
 def handle_fields(embed, fields):
     if fields:
@@ -1882,7 +3308,8 @@ def pick_webhook(hook, passed_webhook=None, url=None):
     return hook
 
 
-webhook_obj = DiscordWebhook(url=None)
+# Created on first use
+webhook_obj = None
 
 
 # Sends a discord message using the users webhook url
@@ -1904,6 +3331,9 @@ def send_discord_message(
 
     try:
         if hook:
+            if webhook_obj is None:
+                webhook_obj = DiscordWebhook(url=None)
+
             webhook_obj.url = hook
 
             if rate_limit:
@@ -1996,7 +3426,7 @@ chapter_numbers_check_pattern = re.compile(
 
 
 # check if volume file name is a chapter
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def contains_chapter_keywords(file_name):
     # Replace "_extra"
     file_name_clean = file_name.replace("_extra", ".5")
@@ -2062,7 +3492,7 @@ bracket_against_extension_pattern = re.compile(
 
 # Removes bracketed content from the string, alongwith any whitespace.
 # As long as the bracketed content is not immediately preceded or followed by a dash.
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def remove_brackets(string):
     # Avoid a string that is only a bracket
     # Probably a series name
@@ -2119,7 +3549,7 @@ volume_regex = re.compile(
 
 
 # Checks if the passed string contains volume keywords
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def contains_volume_keywords(file):
     # Replace _extra
     file = file.replace("_extra", ".5")
@@ -2290,20 +3720,48 @@ def get_file_extension(file):
     return os.path.splitext(file)[1]
 
 
-# Gets the predicted file extension from the file header using filetype
+# The amount of bytes read from the start of a file when sniffing its header.
+# Covers the zip local header and the stored mimetype file of an epub.
+header_sniff_size = 58
+
+# The amount of threads used when sniffing the headers of multiple files at once
+header_sniff_max_workers = 8
+
+
+# Gets the predicted file extension from the header bytes,
+# only checking the signatures of the archive types we handle.
+def sniff_header_extension(header):
+    # zip (local file, empty archive, or spanned archive header)
+    if header[:2] == b"PK" and header[2:3] in (b"\x03", b"\x05", b"\x07"):
+        # An epub starts with its uncompressed mimetype file
+        if header[30:58] == b"mimetypeapplication/epub+zip":
+            return ".epub"
+        return ".cbz"
+    # rar4 and rar5
+    elif header[:6] == b"Rar!\x1a\x07" and header[6:7] in (b"\x00", b"\x01"):
+        return ".cbr"
+    # 7z
+    elif header[:6] == b"7z\xbc\xaf\x27\x1c":
+        return ".7z"
+    return None
+
+
+# Sniffs the file header, cached by the file's size and modification date.
+@registered_cache()
+def get_header_extension_cache(file, size, mod_time):
+    with CountingFile(file) as f:
+        return sniff_header_extension(f.read(header_sniff_size))
+
+
+# Gets the predicted file extension from the file header
 def get_header_extension(file):
     extension_from_name = get_file_extension(file)
     if extension_from_name in manga_extensions or extension_from_name in rar_extensions:
         try:
-            kind = filetype.guess(file)
-            if kind is None:
-                return None
-            elif f".{kind.extension}" in manga_extensions:
-                return ".cbz"
-            elif f".{kind.extension}" in rar_extensions:
-                return ".cbr"
-            else:
-                return f".{kind.extension}"
+            file_info = os.stat(file)
+            return get_header_extension_cache(
+                file, file_info.st_size, file_info.st_mtime
+            )
         except Exception as e:
             send_message(str(e), error=True)
             return None
@@ -2311,6 +3769,16 @@ def get_header_extension(file):
         return None
 
 
+# Gets the predicted file extensions of multiple files at once using a thread pool.
+# Returns a dictionary of each file and its header extension.
+def get_header_extensions(files):
+    if not files:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=header_sniff_max_workers) as executor:
+        return dict(zip(files, executor.map(get_header_extension, files)))
+
+
 # Returns an extensionless name
 def get_extensionless_name(file):
     return os.path.splitext(file)[0]
@@ -2347,6 +3815,132 @@ def get_series_name_from_contents(
     return series_name.strip()
 
 
+# An immutable record of everything parsed from a release's file name.
+# Used to build the File and Volume objects.
+#
+# The type, release number and series name are parsed up front, as every File
+# needs them. The year, part, extras and multi-volume flag are only used by
+# Volume objects, so they're parsed the first time they're read.
+#
+# NOTE: volume_part and extras are parsed without a subtitle,
+# as the subtitle can depend on the internal metadata.
+class ReleaseRecord:
+    __slots__ = (
+        "name",
+        "extensionless_name",
+        "extension",
+        "file_type",
+        "release_number",
+        "series_name",
+        "_release_year",
+        "_volume_part",
+        "_extras",
+        "_multi_volume",
+    )
+
+    def __init__(self, name, extension, file_type, release_number, series_name):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "extensionless_name", get_extensionless_name(name))
+        object.__setattr__(self, "extension", extension)
+        object.__setattr__(self, "file_type", file_type)
+        object.__setattr__(self, "release_number", release_number)
+        object.__setattr__(self, "series_name", series_name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"ReleaseRecord is immutable, can't set {name}")
+
+    # Returns the value of the lazy field, parsing it on first use
+    def get_lazy_field(self, slot, parse):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            value = parse()
+            object.__setattr__(self, slot, value)
+            return value
+
+    @property
+    def release_year(self):
+        return self.get_lazy_field("_release_year", lambda: get_release_year(self.name))
+
+    @property
+    def volume_part(self):
+        return self.get_lazy_field(
+            "_volume_part",
+            lambda: get_file_part(
+                self.name,
+                chapter=self.file_type == "chapter",
+                series_name=self.series_name,
+                subtitle="",
+            ),
+        )
+
+    @property
+    def extras(self):
+        return self.get_lazy_field(
+            "_extras",
+            lambda: tuple(
+                get_extras(
+                    self.name,
+                    chapter=self.file_type == "chapter",
+                    series_name=self.series_name,
+                    extension=self.extension,
+                )
+            ),
+        )
+
+    @property
+    def multi_volume(self):
+        return self.get_lazy_field(
+            "_multi_volume",
+            lambda: (
+                check_for_multi_volume_file(
+                    self.name, chapter=self.file_type == "chapter"
+                )
+                if "-" in self.name
+                else False
+            ),
+        )
+
+    def __str__(self):
+        return f"ReleaseRecord({self.name!r}, {self.file_type}, {self.release_number!r}, {self.series_name!r})"
+
+    def __repr__(self):
+        return str(self)
+
+
+# Parses the file name into a release record. Cached per name and root,
+# so a name is only parsed once per run no matter how many times
+# it's upgraded to a File or Volume object.
+@registered_cache()
+def parse_release_name(name, root="", test_mode=False):
+    file_type = (
+        "chapter"
+        if not contains_volume_keywords(name) and contains_chapter_keywords(name)
+        else "volume"
+    )
+    is_chapter = file_type == "chapter"
+
+    release_number = get_release_number_memo(name, chapter=is_chapter)
+
+    series_name = (
+        get_series_name_from_chapter(
+            name,
+            root,
+            (
+                list(release_number)
+                if isinstance(release_number, tuple)
+                else release_number
+            ),
+        )
+        if is_chapter
+        else get_series_name_from_volume(name, root, test_mode=test_mode)
+    ) or get_series_name_from_contents(os.path.basename(root), [name])
+
+    return ReleaseRecord(
+        name, get_file_extension(name), file_type, release_number, series_name
+    )
+
+
 # Creates and returns file objects from the passed files and root
 def upgrade_to_file_class(
     files,
@@ -2372,44 +3966,38 @@ def upgrade_to_file_class(
             test_mode=test_mode,
         )[0]
 
-    # Create a list of tuples with arguments to pass to the File constructor
-    file_types = [
-        (
-            "chapter"
-            if not contains_volume_keywords(file) and contains_chapter_keywords(file)
-            else "volume"
-        )
-        for file in files
-    ]
+    # Parse each file name once into a release record
+    records = [parse_release_name(file, root, test_mode=test_mode) for file in files]
 
-    chapter_numbers = [
-        get_release_number_cache(file, chapter=file_type == "chapter")
-        for file, file_type in zip(files, file_types)
-    ]
+    global processed_file_count
+    processed_file_count += len(records)
+
+    # Sniff all the file headers at once
+    header_extensions = (
+        get_header_extensions([os.path.join(root, file) for file in files])
+        if not skip_get_header_extension
+        else {}
+    )
 
+    # Create a list of tuples with arguments to pass to the File constructor
     file_args = [
         (
-            file,
-            get_extensionless_name(file),
-            (
-                get_series_name_from_chapter(file, root, chapter_number)
-                if file_type == "chapter"
-                else get_series_name_from_volume(file, root, test_mode=test_mode)
-            )
-            or get_series_name_from_contents(os.path.basename(root), [file]),
-            get_file_extension(file),
+            record.name,
+            record.extensionless_name,
+            record.series_name,
+            record.extension,
             root,
-            os.path.join(root, file),
-            get_extensionless_name(os.path.join(root, file)),
-            chapter_number,
-            file_type,
+            os.path.join(root, record.name),
+            get_extensionless_name(os.path.join(root, record.name)),
             (
-                get_header_extension(os.path.join(root, file))
-                if not skip_get_header_extension
-                else None
+                list(record.release_number)
+                if isinstance(record.release_number, tuple)
+                else record.release_number
             ),
+            record.file_type,
+            header_extensions.get(os.path.join(root, record.name)),
         )
-        for file, file_type, chapter_number in zip(files, file_types, chapter_numbers)
+        for record in records
     ]
 
     results = [File(*args) for args in file_args]
@@ -2423,60 +4011,166 @@ def update_stats(file):
     file_counters[file.extension] += 1
 
 
+# The namespaces used when parsing an epub's container.xml and OPF
+epub_namespaces = {
+    "calibre": "http://calibre.kovidgoyal.net/2009/metadata",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "opf": "http://www.idpf.org/2007/opf",
+    "u": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+}
+
+
+# Lenient parser for OPF files, some publishers ship slightly malformed xml.
+# Created on first use.
+@lru_cache(maxsize=None)
+def get_epub_xml_parser():
+    return etree.XMLParser(recover=True)
+
+
+# Parses all the tags within the OPF into a dictionary of tag names and their text.
+# Tag names keep their prefix and are lowercased. EX: dc:date, dc:publisher
+def parse_opf_tags(opf_root):
+    tags = {}
+    for element in opf_root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        name = etree.QName(element).localname
+        name = f"{element.prefix}:{name}" if element.prefix else name
+        tags[name.lower()] = "".join(element.itertext())
+    return tags
+
+
 # Credit to original source: https://alamot.github.io/epub_cover/
 # Modified by me.
-# Retrieves the inner novel cover
-def get_novel_cover(novel_path):
-    namespaces = {
-        "calibre": "http://calibre.kovidgoyal.net/2009/metadata",
-        "dc": "http://purl.org/dc/elements/1.1/",
-        "dcterms": "http://purl.org/dc/terms/",
-        "opf": "http://www.idpf.org/2007/opf",
-        "u": "urn:oasis:names:tc:opendocument:xmlns:container",
-        "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+# Parses the container.xml, the OPF, and the premium content markers of an epub
+# in one pass and returns them as a descriptor dictionary.
+# Each part is parsed separately, so a broken container.xml or OPF
+# doesn't lose the parts that could be read.
+def parse_epub_descriptor(novel_path):
+    descriptor = {
+        "rootfile_path": None,
+        "cover_href": None,
+        "metadata": {},
+        "is_premium": False,
     }
 
-    try:
-        with zipfile.ZipFile(novel_path) as z:
-            t = etree.fromstring(z.read("META-INF/container.xml"))
-            rootfile_path = t.xpath(
-                "/u:container/u:rootfiles/u:rootfile", namespaces=namespaces
+    with open_zip(novel_path) as z:
+        namelist = z.namelist()
+
+        if "META-INF/container.xml" in namelist:
+            try:
+                t = etree.fromstring(
+                    z.read("META-INF/container.xml"), parser=get_epub_xml_parser()
+                )
+                if t is not None:
+                    rootfile_path = t.xpath(
+                        "/u:container/u:rootfiles/u:rootfile",
+                        namespaces=epub_namespaces,
+                    )
+                    if rootfile_path:
+                        descriptor["rootfile_path"] = rootfile_path[0].get("full-path")
+            except Exception as e:
+                send_message(
+                    f"Failed to parse META-INF/container.xml in {novel_path}: {e}",
+                    error=True,
+                )
+
+        # Fall back to the first OPF in the archive
+        if (
+            not descriptor["rootfile_path"]
+            or descriptor["rootfile_path"] not in namelist
+        ):
+            descriptor["rootfile_path"] = next(
+                (x for x in namelist if x.lower().endswith(".opf")), None
             )
-            if rootfile_path:
-                rootfile_path = rootfile_path[0].get("full-path")
-                t = etree.fromstring(z.read(rootfile_path))
-                cover_id = t.xpath(
-                    "//opf:metadata/opf:meta[@name='cover']", namespaces=namespaces
-                )
-                if cover_id:
-                    cover_id = cover_id[0].get("content")
-                    cover_href = t.xpath(
-                        f"//opf:manifest/opf:item[@id='{cover_id}']",
-                        namespaces=namespaces,
+
+        if descriptor["rootfile_path"]:
+            rootfile_path = descriptor["rootfile_path"]
+            try:
+                t = etree.fromstring(
+                    z.read(rootfile_path), parser=get_epub_xml_parser()
+                )
+
+                if t is not None:
+                    descriptor["metadata"] = parse_opf_tags(t)
+
+                    cover_id = t.xpath(
+                        "//opf:metadata/opf:meta[@name='cover']",
+                        namespaces=epub_namespaces,
                     )
-                    if cover_href:
-                        cover_href = cover_href[0].get("href")
-                        if "%" in cover_href:
-                            cover_href = urllib.parse.unquote(cover_href)
-                        cover_path = os.path.join(
-                            os.path.dirname(rootfile_path), cover_href
+                    if cover_id:
+                        cover_id = cover_id[0].get("content")
+                        cover_href = t.xpath(
+                            f"//opf:manifest/opf:item[@id='{cover_id}']",
+                            namespaces=epub_namespaces,
                         )
-                        return cover_path
-                    else:
-                        print("\t\t\tNo cover_href found in get_novel_cover()")
-                else:
-                    print("\t\t\tNo cover_id found in get_novel_cover()")
-            else:
-                print(
-                    "\t\t\tNo rootfile_path found in META-INF/container.xml in get_novel_cover()"
+                        if cover_href:
+                            cover_href = cover_href[0].get("href")
+                            if "%" in cover_href:
+                                cover_href = urllib.parse.unquote(cover_href)
+                            descriptor["cover_href"] = os.path.join(
+                                os.path.dirname(rootfile_path), cover_href
+                            )
+            except Exception as e:
+                send_message(
+                    f"Failed to parse {rootfile_path} in {novel_path}: {e}",
+                    error=True,
                 )
+
+        descriptor["is_premium"] = scan_for_premium_content(z, namelist)
+
+    return descriptor
+
+
+# Returns the epub descriptor for the given size and mod time,
+# parsing it only if it isn't in the persistent cache.
+@registered_cache()
+def get_epub_descriptor_cache(novel_path, size, mod_time):
+    descriptor = cache_manager.get_epub_descriptor(novel_path, size, mod_time)
+    if descriptor is not None:
+        return descriptor
+
+    try:
+        descriptor = parse_epub_descriptor(novel_path)
     except Exception as e:
         send_message(str(e), error=True)
-    return None
+        return None
+
+    cache_manager.set_epub_descriptor(novel_path, size, mod_time, descriptor)
+    return descriptor
+
+
+# Retrieves the cached epub descriptor of the novel, keyed by its size and mod time.
+def get_epub_descriptor(novel_path):
+    try:
+        file_info = os.stat(novel_path)
+    except OSError as e:
+        send_message(str(e), error=True)
+        return None
+
+    return get_epub_descriptor_cache(novel_path, file_info.st_size, file_info.st_mtime)
+
+
+# Retrieves the inner novel cover
+def get_novel_cover(novel_path):
+    descriptor = get_epub_descriptor(novel_path)
+    if not descriptor:
+        return None
+
+    if not descriptor["rootfile_path"]:
+        print(
+            "\t\t\tNo rootfile_path found in META-INF/container.xml in get_novel_cover()"
+        )
+    elif not descriptor["cover_href"]:
+        print("\t\t\tNo cover_href found in get_novel_cover()")
+
+    return descriptor["cover_href"]
 
 
 # Checks if the passed string is a volume one.
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def is_volume_one(volume_name):
     if "1" not in volume_name and "one" not in volume_name.lower():
         return False
@@ -2525,7 +4219,7 @@ def is_one_shot(file_name, root=None, skip_folder_check=False, test_mode=False):
 
 
 # Checks similarity between two strings.
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def similar(a, b):
     # convert to lowercase and strip
     a = a.lower().strip()
@@ -2571,7 +4265,7 @@ def get_file_hash(file, is_internal=False, internal_file_name=None):
         hash_obj = hashlib.sha256()
 
         if is_internal:
-            with zipfile.ZipFile(file) as zip:
+            with open_zip(file) as zip:
                 with zip.open(internal_file_name) as internal_file:
                     while True:
                         data = internal_file.read(BUF_SIZE)
@@ -2579,7 +4273,7 @@ def get_file_hash(file, is_internal=False, internal_file_name=None):
                             break
                         hash_obj.update(data)
         else:
-            with open(file, "rb") as f:
+            with CountingFile(file) as f:
                 while True:
                     data = f.read(BUF_SIZE)
                     if not data:
@@ -2699,7 +4393,7 @@ def contains_keyword(file_string, chapter=False):
 
 # Retrieves the series name through various regexes
 # Removes the volume number and anything to the right of it, and strips it.
-@lru_cache(maxsize=3500)
+@registered_cache()
 def get_series_name_from_volume(name, root, test_mode=False, second=False):
     # Remove starting brackets
     # EX: "[WN] Series Name" -> "Series Name"
@@ -2794,7 +4488,7 @@ def get_series_name_from_volume(name, root, test_mode=False, second=False):
 
 
 # Cleans the chapter file_name to retrieve the series_name
-@lru_cache(maxsize=3500)
+@registered_cache()
 def chapter_file_name_cleaning(
     file_name, chapter_number="", skip=False, regex_matched=False
 ):
@@ -2969,7 +4663,7 @@ def get_folder_type(files, extensions=None, file_type=None):
 # Determines if a volume file is a multi-volume file or not
 # EX: TRUE == series_title v01-03.cbz
 # EX: FALSE == series_title v01.cbz
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def check_for_multi_volume_file(file_name, chapter=False):
     # Set the list of keywords to search for
     keywords = volume_regex_keywords if not chapter else chapter_regex_keywords + "|"
@@ -3052,7 +4746,7 @@ volume_number_search_pattern = re.compile(
 
 
 # Finds the volume/chapter number(s) in the file name.
-@lru_cache(maxsize=3500)
+# (memoized through get_release_number_memo())
 def get_release_number(file, chapter=False):
 
     # Cleans up the chapter's series name
@@ -3236,9 +4930,20 @@ def get_release_number(file, chapter=False):
     return ""
 
 
+# Returns the raw (unconverted) result of get_release_number(),
+# memoized in release_number_memo by (file, chapter).
+def get_release_number_memo(file, chapter=False):
+    key = (file, bool(chapter))
+    found, result = release_number_memo.lookup(key)
+    if not found:
+        result = get_release_number(file, chapter=key[1])
+        release_number_memo.store(key, result)
+    return result
+
+
 # Allows get_release_number() to use a cache
 def get_release_number_cache(file, chapter=False):
-    result = get_release_number(file, chapter=chapter)
+    result = get_release_number_memo(file, chapter=chapter)
     return list(result) if isinstance(result, tuple) else result
 
 
@@ -3276,11 +4981,86 @@ def get_release_year(name, metadata=None):
     return result
 
 
-# Pre-compiled publisher regex
-publishers_joined_regex = ""
+# Matches a list of known literals (publishers, release groups) that sit
+# directly between an opening and a closing bracket in a name. EX: "(Yen Press)"
+#
+# Instead of running an alternation of every literal across the whole name,
+# only the bracketed spans are looked up, case-insensitively, in a dict.
+# The results are the same as the old lookbehind/lookahead alternation,
+# including preferring the earlier listed literal when two could match.
+class BracketedLiteralMatcher:
+    opening_brackets = "([{"
+    closing_brackets = ")]}"
+
+    def __init__(self, literals):
+        self.literals = {}
+        for idx, literal in enumerate(literals):
+            if literal:
+                self.literals.setdefault(self.lower(literal), idx)
+        self.max_length = max(map(len, self.literals), default=0)
+
+    # Lowercases the string without changing its length (EX: "İ"),
+    # so the spans of the lowered string line up with the original.
+    @staticmethod
+    def lower(s):
+        lowered = s.lower()
+        if len(lowered) == len(s):
+            return lowered
+        return "".join(c.lower() if len(c.lower()) == 1 else c for c in s)
+
+    # Returns the (start, end) of the match starting at or after the passed position
+    def find_span(self, name, lowered, start=0):
+        for open_idx in range(max(start - 1, 0), len(name)):
+            if name[open_idx] not in self.opening_brackets:
+                continue
+
+            match_start = open_idx + 1
+            if match_start < start:
+                continue
+
+            best = None
+            end_limit = min(len(name), match_start + self.max_length + 1)
+            for close_idx in range(match_start + 1, end_limit):
+                if name[close_idx] not in self.closing_brackets:
+                    continue
+                idx = self.literals.get(lowered[match_start:close_idx])
+                if idx is not None and (best is None or idx < best[0]):
+                    best = (idx, close_idx)
+
+            if best:
+                return match_start, best[1]
+        return None
+
+    # Returns the first match in the name, or None
+    def search(self, name):
+        if not self.literals or not contains_brackets(name):
+            return None
+
+        span = self.find_span(name, self.lower(name))
+        return name[span[0] : span[1]] if span else None
+
+    # Returns every non-overlapping match in the name
+    def findall(self, name):
+        if not self.literals or not contains_brackets(name):
+            return []
+
+        results = []
+        lowered = self.lower(name)
+        span = self.find_span(name, lowered)
+        while span:
+            results.append(name[span[0] : span[1]])
+            span = self.find_span(name, lowered, span[1])
+        return results
+
+    def __bool__(self):
+        return bool(self.literals)
+
+
+# Returns a compiled case-insensitive pattern that matches the literal string
+@registered_cache()
+def get_literal_pattern(s):
+    return re.compile(re.escape(s), re.IGNORECASE)
 
-# Pre-compile release group regex
-release_groups_joined_regex = ""
 
 # Pre-compiled regex for the release group at the end of the file name
 release_group_end_regex = re.compile(
@@ -3294,25 +5074,21 @@ def get_extra_from_group(
 ):
     if (
         not groups
-        or (publisher_m and not publishers_joined)
-        or (release_group_m and not release_groups_joined)
+        or (publisher_m and not publishers_matcher)
+        or (release_group_m and not release_groups_matcher)
     ):
         return ""
 
     search = ""
 
-    if publisher_m and publishers_joined_regex and contains_brackets(name):
-        search = publishers_joined_regex.search(name)
-        if search:
-            search = search.group()
+    if publisher_m:
+        search = publishers_matcher.search(name)
 
     elif release_group_m:
-        # remove series name from the file name, re.escape it
+        # remove series name from the file name
         series_free_name = ""
         if series_name:
-            series_free_name = re.sub(
-                re.escape(series_name), "", name, flags=re.IGNORECASE
-            ).strip()
+            series_free_name = get_literal_pattern(series_name).sub("", name).strip()
 
         search = (
             release_group_end_regex.search(series_free_name or name)
@@ -3323,8 +5099,8 @@ def get_extra_from_group(
         if search:
             search = search.group(1)
 
-        if not search and release_groups_joined_regex and contains_brackets(name):
-            search = release_groups_joined_regex.findall(name)
+        if not search:
+            search = release_groups_matcher.findall(name)
             if search:
                 search = search[-1]  # use the last element
 
@@ -3344,7 +5120,7 @@ rx_remove_x_hash = re.compile(r"((x|#))", re.IGNORECASE)
 
 
 # Retrieves and returns the file part from the file name
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def get_file_part(file, chapter=False, series_name=None, subtitle=None):
     result = ""
 
@@ -3459,7 +5235,7 @@ def is_image_black_and_white(image, tolerance=15):
 # Function to check if the first image in a zip file is black and white
 def is_first_image_black_and_white(zip_path):
     try:
-        with zipfile.ZipFile(zip_path, "r") as zip_file:
+        with open_zip(zip_path) as zip_file:
             # Sort files alphabetically and get the first one
             sorted_files = sorted(zip_file.namelist())
             if not sorted_files:
@@ -3479,7 +5255,7 @@ def is_first_image_black_and_white(zip_path):
 # Return the number of image files in the .cbz archive.
 def count_images_in_cbz(file_path):
     try:
-        with zipfile.ZipFile(file_path, "r") as archive:
+        with open_zip(file_path) as archive:
             images = [
                 f
                 for f in archive.namelist()
@@ -3517,6 +5293,12 @@ def upgrade_to_volume_class(
         internal_metadata = None
         publisher = Publisher(None, None)
 
+        # The release record can only be used if the file object
+        # wasn't created with a different type or series name.
+        record = parse_release_name(file.name, file.root, test_mode=test_mode)
+        if record.file_type != file.file_type or record.series_name != file.basename:
+            record = None
+
         if (not skip_release_year or not skip_publisher) and file.file_type == "volume":
             internal_metadata = get_internal_metadata(file.path, file.extension)
 
@@ -3533,7 +5315,11 @@ def upgrade_to_volume_class(
             file.basename,
             get_shortened_title(file.basename),
             (
-                get_release_year(file.name, internal_metadata)
+                (
+                    record.release_year
+                    if record and (record.release_year or not internal_metadata)
+                    else get_release_year(file.name, internal_metadata)
+                )
                 if not skip_release_year
                 else None
             ),
@@ -3568,7 +5354,9 @@ def upgrade_to_volume_class(
             file.header_extension,
             (
                 (
-                    check_for_multi_volume_file(
+                    record.multi_volume
+                    if record
+                    else check_for_multi_volume_file(
                         file.name,
                         chapter=file.file_type == "chapter",
                     )
@@ -3589,20 +5377,28 @@ def upgrade_to_volume_class(
             )
 
         if not skip_file_part:
-            file_obj.volume_part = get_file_part(
-                file_obj.name,
-                series_name=file_obj.series_name,
-                subtitle=file_obj.subtitle,
-                chapter=file_obj.file_type == "chapter",
+            file_obj.volume_part = (
+                record.volume_part
+                if record and not file_obj.subtitle
+                else get_file_part(
+                    file_obj.name,
+                    series_name=file_obj.series_name,
+                    subtitle=file_obj.subtitle,
+                    chapter=file_obj.file_type == "chapter",
+                )
             )
 
         if not skip_extras:
-            file_obj.extras = get_extras(
-                file_obj.name,
-                chapter=file_obj.file_type == "chapter",
-                series_name=file_obj.series_name,
-                subtitle=file_obj.subtitle,
-                extension=file_obj.extension,
+            file_obj.extras = (
+                list(record.extras)
+                if record and not file_obj.subtitle
+                else get_extras(
+                    file_obj.name,
+                    chapter=file_obj.file_type == "chapter",
+                    series_name=file_obj.series_name,
+                    subtitle=file_obj.subtitle,
+                    extension=file_obj.extension,
+                )
             )
 
         if (
@@ -3659,27 +5455,72 @@ compiled_searches = [
     re.compile(keyword.name, re.IGNORECASE) for keyword in ranked_keywords
 ]
 
+# Matches keyword patterns that refer back to their own groups,
+# which can't be safely combined into a single pattern.
+backreference_pattern = re.compile(r"\\[1-9]|\(\?P=|\\g<")
+
+
+# Compiles the ranked keywords that apply to the passed file type.
+# Returns the (keyword, compiled_search) pairs, in their ranked_keywords order,
+# and a combined scanner with one named group per keyword that's used to skip
+# names without any keyword match in a single pass.
+# (None when a keyword can't be combined)
+def compile_ranked_keywords(file_type):
+    searches = [
+        (keyword, compiled_search)
+        for keyword, compiled_search in zip(ranked_keywords, compiled_searches)
+        if keyword.file_type in ["both", file_type]
+    ]
 
-# Retrieves the ranked keyword score and matching tags
-# for the passed releases.
-def get_keyword_scores(releases):
-    results = []
+    scanner = None
+    if searches and not any(
+        backreference_pattern.search(keyword.name) for keyword, _ in searches
+    ):
+        try:
+            scanner = re.compile(
+                "|".join(
+                    f"(?P<keyword_{idx}>{keyword.name})"
+                    for idx, (keyword, _) in enumerate(searches)
+                ),
+                re.IGNORECASE,
+            )
+        except Exception:
+            scanner = None
 
-    for release in releases:
-        tags, score = [], 0.0
+    return searches, scanner
 
-        for idx, (keyword, compiled_search) in enumerate(
-            zip(ranked_keywords, compiled_searches)
-        ):
-            if keyword.file_type in ["both", release.file_type]:
-                search = compiled_search.search(release.name)
-                if search:
-                    tags.append(Keyword(search.group(), keyword.score))
-                    score += keyword.score
 
-        results.append(RankedKeywordResult(score, tags))
+# The compiled ranked keywords, keyed by file type
+compiled_ranked_keywords = {}
 
-    return results
+
+# Retrieves the ranked keyword score and matching tags for the passed name.
+# Memoized per (name, file_type), as the same releases get compared repeatedly
+# when checking for upgrades and duplicates.
+@registered_cache()
+def get_keyword_score(name, file_type):
+    if file_type not in compiled_ranked_keywords:
+        compiled_ranked_keywords[file_type] = compile_ranked_keywords(file_type)
+
+    searches, scanner = compiled_ranked_keywords[file_type]
+    tags, score = [], 0.0
+
+    # Every keyword is still searched on its own when the scanner finds a match,
+    # so overlapping keywords are each counted, like before.
+    if searches and (not scanner or scanner.search(name)):
+        for keyword, compiled_search in searches:
+            search = compiled_search.search(name)
+            if search:
+                tags.append(Keyword(search.group(), keyword.score))
+                score += keyword.score
+
+    return RankedKeywordResult(score, tags)
+
+
+# Retrieves the ranked keyword score and matching tags
+# for the passed releases.
+def get_keyword_scores(releases):
+    return [get_keyword_score(release.name, release.file_type) for release in releases]
 
 
 # > This class represents the result of an upgrade check
@@ -3816,6 +5657,7 @@ def remove_folder(folder):
 
 
 # Removes a file and its associated image files.
+@file_event("remove")
 def remove_file(full_file_path, silent=False):
     global grouped_notifications
 
@@ -3930,6 +5772,7 @@ def move_folder(folder, new_location, silent=False):
 
 
 # Move a file
+@file_event("move", get_path=lambda file, *args, **kwargs: file.path)
 def move_file(
     file,
     new_location,
@@ -3988,6 +5831,9 @@ def move_file(
 
 
 # Replaces an old file.
+@file_event(
+    "replace", get_path=lambda old_file, new_file, *args, **kwargs: new_file.path
+)
 def replace_file(old_file, new_file, highest_index_num=""):
     global grouped_notifications
     result = False
@@ -4348,7 +6194,7 @@ def write_to_file(
         log_file_path = os.path.join(logs_dir_loc, file)
 
         if check_for_dup and os.path.isfile(log_file_path):
-            contains = check_text_file_for_message(log_file_path, message)
+            contains = is_message_in_log_file(log_file_path, message)
 
         if not contains or overwrite:
             try:
@@ -4366,6 +6212,12 @@ def write_to_file(
                             f.write(f"\n{dt_string} {message}")
                     write_status = True
 
+                    add_message_to_log_index(
+                        log_file_path,
+                        message if without_timestamp else f"{dt_string} {message}",
+                        overwrite,
+                    )
+
                 except Exception as e:
                     send_message(str(e), error=True, log=False)
             except Exception as e:
@@ -4373,7 +6225,196 @@ def write_to_file(
     return write_status
 
 
+# Parses the volume numbers from the files in a folder.
+# Returns the number of valid volumes and their volume numbers,
+# with multi-volume releases expanded into each volume number they cover.
+def get_volume_numbers_in_folder(root, files):
+    # Clean and sort the existing directory.
+    filtered_files = clean_and_sort(root, files, chapters=False)[0]
+
+    # Skip if the existing directory is empty.
+    if not filtered_files:
+        return 0, []
+
+    # Upgrade the existing directory to a list of Volume objects.
+    volumes = upgrade_to_volume_class(
+        upgrade_to_file_class(
+            [f for f in filtered_files if os.path.isfile(os.path.join(root, f))],
+            root,
+        ),
+        skip_release_year=True,
+        skip_release_group=True,
+        skip_extras=True,
+        skip_publisher=True,
+        skip_premium_content=True,
+        skip_subtitle=True,
+    )
+
+    # Filter out volumes that don't have a valid volume number.
+    volumes = [
+        volume
+        for volume in volumes
+        if isinstance(volume.volume_number, (int, float, list))
+    ]
+
+    # Extract volume numbers from the existing volumes.
+    volume_numbers = [
+        num
+        for volume in volumes
+        for num in (
+            range(
+                int(min(volume.volume_number)),
+                int(max(volume.volume_number)) + 1,
+            )
+            if isinstance(volume.volume_number, list)
+            else [volume.volume_number]
+        )
+        if num != ""
+    ]
+
+    return len(volumes), volume_numbers
+
+
+# Builds the series -> volume numbers index for every folder in the path.
+# Folders that haven't changed since they were last indexed are read
+# straight from the cache instead of being re-parsed.
+def build_volume_index(path):
+    volume_index = {}
+    fingerprint = get_cache_fingerprint()
+
+    for folder in iter_folders_recursively_in_dir(path):
+        root = folder["root"]
+        try:
+            mod_time = os.path.getmtime(root)
+            cached = cache_manager.get_volume_index(root, fingerprint, mod_time)
+
+            if cached is None:
+                cached = get_volume_numbers_in_folder(root, folder["files"])
+                cache_manager.set_volume_index(root, fingerprint, mod_time, cached)
+
+            volume_index[root] = cached
+        except Exception as e:
+            send_message(
+                f"\nERROR in build_volume_index(): {e} with folder: {root}",
+                error=True,
+            )
+
+    try:
+        cache_manager.prune_volume_indexes()
+    except Exception as e:
+        send_message(f"\nERROR in build_volume_index(): {e}", error=True)
+
+    return volume_index
+
+
+# Finds the missing volume numbers, between volume one and the highest
+# volume number, for every series in the volume index at once.
+# Returns a dict of root -> (highest volume number, missing volume numbers)
+def find_missing_volumes(volume_index):
+    roots = []
+    series_ids = []
+    numbers = []
+
+    for root, (volume_count, volume_numbers) in volume_index.items():
+        # Skip if there are less than 2 volumes in the directory.
+        if volume_count < 2 or not volume_numbers:
+            continue
+
+        series_ids.extend([len(roots)] * len(volume_numbers))
+        numbers.extend(volume_numbers)
+        roots.append(root)
+
+    if not roots:
+        return {}
+
+    series_ids = np.asarray(series_ids, dtype=np.int64)
+    numbers = np.asarray(numbers, dtype=np.float64)
+    series_count = len(roots)
+
+    # Skip series with less than 2 unique volume numbers.
+    unique_pairs = np.unique(np.stack([series_ids, numbers]), axis=1)
+    unique_counts = np.bincount(
+        unique_pairs[0].astype(np.int64), minlength=series_count
+    )
+
+    highest = np.full(series_count, -np.inf)
+    np.maximum.at(highest, series_ids, numbers)
+    highest = np.where(unique_counts >= 2, np.trunc(highest), 0)
+    highest = np.clip(highest, 0, None).astype(np.int64)
+
+    # Every volume number from 1 to the highest, for every series,
+    # encoded as series_id * stride + number.
+    stride = int(highest.max()) + 1
+    grid_series_ids = np.repeat(np.arange(series_count), highest)
+    grid_numbers = (
+        np.arange(highest.sum()) - np.repeat(np.cumsum(highest) - highest, highest) + 1
+    )
+    expected = grid_series_ids * stride + grid_numbers
+
+    # The whole volume numbers that are present
+    whole = (numbers == np.floor(numbers)) & (numbers >= 1) & (numbers < stride)
+    present = series_ids[whole] * stride + numbers[whole].astype(np.int64)
+
+    missing = np.setdiff1d(expected, present, assume_unique=True)
+
+    results = {}
+    for series_id, number in zip(
+        (missing // stride).tolist(), (missing % stride).tolist()
+    ):
+        root = roots[series_id]
+        if root not in results:
+            results[root] = (int(highest[series_id]), [])
+        results[root][1].append(number)
+
+    # Keep the order the folders were found in
+    return {root: results[root] for root in roots if root in results}
+
+
+# Writes the missing volumes to a JSON or CSV report in the logs folder.
+def write_missing_volumes_report(missing_volumes, report_format):
+    report_path = os.path.join(LOGS_DIR, f"missing_volumes.{report_format}")
+
+    fields = ["series", "path", "highest_volume", "missing_volumes"]
+    rows = [
+        {
+            "series": os.path.basename(root),
+            "path": root,
+            "highest_volume": highest,
+            "missing_volumes": missing,
+        }
+        for root, (highest, missing) in missing_volumes.items()
+    ]
+
+    try:
+        os.makedirs(LOGS_DIR, exist_ok=True)
+
+        if report_format == "json":
+            with open(report_path, "w", encoding="utf-8") as report:
+                json.dump(rows, report, indent=4, ensure_ascii=False)
+        else:
+            with open(report_path, "w", encoding="utf-8", newline="") as report:
+                writer = csv.DictWriter(report, fieldnames=fields)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(
+                        {
+                            **row,
+                            "missing_volumes": " ".join(
+                                map(str, row["missing_volumes"])
+                            ),
+                        }
+                    )
+
+        print(f"\n\tMissing volumes report written to: {report_path}")
+    except Exception as e:
+        send_message(
+            f"\nERROR in write_missing_volumes_report(): {e}",
+            error=True,
+        )
+
+
 # Checks for any missing volumes between the lowest volume of a series and the highest volume.
+@metered_stage
 def check_for_missing_volumes():
     print("\nChecking for missing volumes...")
 
@@ -4381,97 +6422,30 @@ def check_for_missing_volumes():
         print("\tNo paths found.")
         return
 
+    missing_volumes = {}
+
     for path in paths:
         if not os.path.exists(path) or path in download_folders:
             continue
 
         os.chdir(path)
 
-        folders = get_all_folders_recursively_in_dir(path)
-
-        for folder in folders:
-            root = folder["root"]
-            dirs = folder["dirs"]
-            files = folder["files"]
-
-            # Clean and sort the existing directory.
-            filtered_files = clean_and_sort(root, files, chapters=False)[0]
-
-            # Skip if the existing directory is empty.
-            if not filtered_files:
-                continue
-
-            # Upgrade the existing directory to a list of Volume objects.
-            volumes = upgrade_to_volume_class(
-                upgrade_to_file_class(
-                    [
-                        f
-                        for f in filtered_files
-                        if os.path.isfile(os.path.join(root, f))
-                    ],
-                    root,
-                ),
-                skip_release_year=True,
-                skip_release_group=True,
-                skip_extras=True,
-                skip_publisher=True,
-                skip_premium_content=True,
-                skip_subtitle=True,
-            )
-
-            # Filter out volumes that don't have a valid volume number.
-            volumes = [
-                volume
-                for volume in volumes
-                if isinstance(volume.volume_number, (int, float, list))
-            ]
-
-            # Skip if there are less than 2 volumes in the directory.
-            if len(volumes) < 2:
-                continue
-
-            # Extract volume numbers from the existing volumes.
-            volume_numbers = {
-                num
-                for volume in volumes
-                for num in (
-                    range(
-                        int(min(volume.volume_number)),
-                        int(max(volume.volume_number)) + 1,
-                    )
-                    if isinstance(volume.volume_number, list)
-                    else [volume.volume_number]
-                )
-                if num != ""
-            }
-
-            # Sort and remove duplicate volume numbers.
-            volume_numbers_second = sorted(volume_numbers)
-
-            if len(volume_numbers_second) < 2:
-                continue
-
-            # Get the lowest and highest volume numbers.
-            lowest_volume_number = 1
-            highest_volume_number = int(max(volume_numbers_second))
-
-            # Create a range of volume numbers between the lowest and highest.
-            volume_num_range = [
-                num
-                for num in range(lowest_volume_number, highest_volume_number + 1)
-                if num not in volume_numbers_second
-            ]
-
-            if not volume_num_range:
-                continue
+        path_missing_volumes = find_missing_volumes(build_volume_index(path))
 
+        for root, (highest, missing) in path_missing_volumes.items():
             print(f"\t{root}")
 
-            for number in volume_num_range:
+            for number in missing:
                 print(f"\t\tVolume {number}")
 
+        missing_volumes.update(path_missing_volumes)
+
+    if missing_volumes_report_format in ["json", "csv"]:
+        write_missing_volumes_report(missing_volumes, missing_volumes_report_format)
+
 
 # Renames the file.
+@file_event("rename")
 def rename_file(src, dest, silent=False):
     result = False
     if os.path.isfile(src):
@@ -4614,18 +6588,9 @@ def get_internal_metadata(file_path, extension):
                     comicinfo = comicinfo.decode("utf-8")
                     metadata = parse_comicinfo_xml(comicinfo)
         elif extension in novel_extensions:
-            regex_searches = [
-                r"content.opf",
-                r"contents.opf",
-                r"package.opf",
-                r"standard.opf",
-                r"volume.opf",
-                r"metadata.opf",
-                r"978.*.opf",
-            ]
-            opf = get_file_from_zip(file_path, regex_searches, ".opf")
-            if opf:
-                metadata = parse_html_tags(opf)
+            descriptor = get_epub_descriptor(file_path)
+            if descriptor:
+                metadata = descriptor["metadata"]
             if not metadata:
                 send_message(
                     f"No opf file found in {file_path}. Skipping metadata retrieval.",
@@ -4939,7 +6904,7 @@ dual_space_pattern = re.compile(r"(\s{2,})")
 
 
 # Replaces any pesky double spaces
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def remove_dual_space(s):
     if "  " not in s:
         return s
@@ -4947,12 +6912,77 @@ def remove_dual_space(s):
     return dual_space_pattern.sub(" ", s)
 
 
-# Removes common words to improve string matching accuracy between a series_name
-# from a file name, and a folder name, useful for when releasers sometimes include them,
-# and sometimes don't.
-@lru_cache(maxsize=3500)
-def normalize_str(
-    s,
+# The word groups removed by normalize_str(), in the order they're applied.
+normalize_common_words = [
+    "the",
+    "a",
+    "à",
+    "and",
+    "&",
+    "I",
+    "of",
+]
+
+normalize_editions = [
+    "Collection",
+    "Master Edition",
+    "(2|3|4|5)-in-1 Edition",
+    "Edition",
+    "Exclusive",
+    "Anniversary",
+    "Deluxe",
+    # "Omnibus",
+    "Digital",
+    "Official",
+    "Anthology",
+    "Limited",
+    "Complete",
+    "Collector",
+    "Ultimate",
+    "Special",
+]
+
+# (?<!^) = Cannot start with this word.
+# EX: "Book Girl" light novel series.
+normalize_type_keywords = [
+    "(?<!^)Novel",
+    "(?<!^)Light Novel",
+    "(?<!^)Manga",
+    "(?<!^)Comic",
+    "(?<!^)LN",
+    "(?<!^)Series",
+    "(?<!^)Volume",
+    "(?<!^)Chapter",
+    "(?<!^)Book",
+    "(?<!^)MANHUA",
+]
+
+normalize_japanese_particles = [
+    "wa",
+    "o",
+    "mo",
+    "ni",
+    "e",
+    "de",
+    "ga",
+    "kara",
+    "to",
+    "ya",
+    r"no(?!\.)",
+    "ne",
+    "yo",
+]
+
+normalize_misc_words = [r"((\d+)([-_. ]+)?th)", "x", "×", "HD"]
+
+normalize_storefront_keywords = [
+    r"Book(\s+)?walker",
+]
+
+
+# Builds the precompiled patterns used by normalize_str() for one
+# combination of skip flags, in the order they're applied.
+def build_normalize_patterns(
     skip_common_words=False,
     skip_editions=False,
     skip_type_keywords=False,
@@ -4960,100 +6990,78 @@ def normalize_str(
     skip_misc_words=False,
     skip_storefront_keywords=False,
 ):
-    if len(s) <= 1:
-        return s
-
     words_to_remove = []
 
     if not skip_common_words:
-        common_words = [
-            "the",
-            "a",
-            "à",
-            "and",
-            "&",
-            "I",
-            "of",
-        ]
-        words_to_remove.extend(common_words)
+        words_to_remove.extend(rf"\b{word}\b" for word in normalize_common_words)
 
     if not skip_editions:
-        editions = [
-            "Collection",
-            "Master Edition",
-            "(2|3|4|5)-in-1 Edition",
-            "Edition",
-            "Exclusive",
-            "Anniversary",
-            "Deluxe",
-            # "Omnibus",
-            "Digital",
-            "Official",
-            "Anthology",
-            "Limited",
-            "Complete",
-            "Collector",
-            "Ultimate",
-            "Special",
-        ]
-        words_to_remove.extend(editions)
+        words_to_remove.extend(rf"\b{word}\b" for word in normalize_editions)
 
     if not skip_type_keywords:
-        # (?<!^) = Cannot start with this word.
-        # EX: "Book Girl" light novel series.
-        type_keywords = [
-            "(?<!^)Novel",
-            "(?<!^)Light Novel",
-            "(?<!^)Manga",
-            "(?<!^)Comic",
-            "(?<!^)LN",
-            "(?<!^)Series",
-            "(?<!^)Volume",
-            "(?<!^)Chapter",
-            "(?<!^)Book",
-            "(?<!^)MANHUA",
-        ]
-        words_to_remove.extend(type_keywords)
+        words_to_remove.extend(rf"{word}\s" for word in normalize_type_keywords)
 
     if not skip_japanese_particles:
-        japanese_particles = [
-            "wa",
-            "o",
-            "mo",
-            "ni",
-            "e",
-            "de",
-            "ga",
-            "kara",
-            "to",
-            "ya",
-            r"no(?!\.)",
-            "ne",
-            "yo",
-        ]
-        words_to_remove.extend(japanese_particles)
+        words_to_remove.extend(rf"\b{word}\b" for word in normalize_japanese_particles)
 
     if not skip_misc_words:
-        misc_words = [r"((\d+)([-_. ]+)?th)", "x", "×", "HD"]
-        words_to_remove.extend(misc_words)
+        words_to_remove.extend(rf"\b{word}\b" for word in normalize_misc_words)
 
     if not skip_storefront_keywords:
-        storefront_keywords = [
-            r"Book(\s+)?walker",
-        ]
-        words_to_remove.extend(storefront_keywords)
+        words_to_remove.extend(rf"\b{word}\b" for word in normalize_storefront_keywords)
+
+    return [re.compile(word, flags=re.IGNORECASE) for word in words_to_remove]
+
+
+# The precompiled normalize_str() patterns for each skip flag combination,
+# keyed by the tuple of skip flags.
+normalize_patterns = {
+    flags: build_normalize_patterns(*flags)
+    for flags in itertools.product((False, True), repeat=6)
+}
+
+
+# Removes common words to improve string matching accuracy between a series_name
+# from a file name, and a folder name, useful for when releasers sometimes include them,
+# and sometimes don't.
+@registered_cache(persistable=True)
+def normalize_str(
+    s,
+    skip_common_words=False,
+    skip_editions=False,
+    skip_type_keywords=False,
+    skip_japanese_particles=False,
+    skip_misc_words=False,
+    skip_storefront_keywords=False,
+):
+    if len(s) <= 1:
+        return s
 
-    for word in words_to_remove:
-        pattern = rf"\b{word}\b" if word not in type_keywords else rf"{word}\s"
-        s = re.sub(pattern, " ", s, flags=re.IGNORECASE).strip()
+    patterns = normalize_patterns[
+        (
+            bool(skip_common_words),
+            bool(skip_editions),
+            bool(skip_type_keywords),
+            bool(skip_japanese_particles),
+            bool(skip_misc_words),
+            bool(skip_storefront_keywords),
+        )
+    ]
 
-        s = remove_dual_space(s)
+    # Each word is removed in turn, as removing one can change what the
+    # next matches. EX: "Book" is only a type keyword when it's not the first word.
+    if patterns:
+        s = remove_dual_space(s.strip())
+        for pattern in patterns:
+            s, count = pattern.subn(" ", s)
+            if count:
+                s = remove_dual_space(s.strip())
 
     return s.strip()
 
 
 # Removes the s from any words that end in s
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def remove_s(s):
     return (
         re.sub(r"\b(\w+)(s)\b", r"\1", s, flags=re.IGNORECASE).strip()
@@ -5072,14 +7080,14 @@ def contains_punctuation(s):
 
 
 # Returns a string without punctuation.
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def remove_punctuation(s):
     return punctuation_pattern.sub(" ", s).strip()
 
 
 # Cleans the string by removing punctuation, bracketed info, and replacing underscores with periods.
 # Converts the string to lowercase and removes leading/trailing whitespace.
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def clean_str(
     string,
     skip_lowercase_convert=False,
@@ -5129,6 +7137,7 @@ def clean_str(
 
 
 # Creates folders for our stray volumes sitting in the root of the download folder.
+@metered_stage
 def create_folders_for_items_in_download_folder():
     global transferred_files, transferred_dirs, grouped_notifications
 
@@ -5291,7 +7300,7 @@ def create_folders_for_items_in_download_folder():
 
 
 # convert string to acsii
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def convert_to_ascii(s):
     return "".join(i for i in s if ord(i) < 128)
 
@@ -5369,45 +7378,50 @@ class Result:
 # gets the toc.xhtml or copyright.xhtml file from the novel file and checks
 # that for premium content
 def contains_premium_content(file):
+    descriptor = get_epub_descriptor(file)
+    return descriptor["is_premium"] if descriptor else False
+
+
+# Scans the already opened novel zip file for premium content
+def scan_for_premium_content(zf, namelist):
     bonus_content_found = False
     try:
-        with zipfile.ZipFile(file, "r") as zf:
-            lower_list = str(zf.namelist()).lower()
-            if (
-                "bonus" in lower_list
-                and "/signup" in lower_list
-                and re.search(
-                    r"((bonus)_?([0-9]+)?\.xhtml)",
-                    lower_list,
-                    re.IGNORECASE,
-                )
-            ):
-                bonus_content_found = True
+        lower_list = str(namelist).lower()
+        if (
+            "bonus" in lower_list
+            and "/signup" in lower_list
+            and re.search(
+                r"((bonus)_?([0-9]+)?\.xhtml)",
+                lower_list,
+                re.IGNORECASE,
+            )
+        ):
+            bonus_content_found = True
 
-            if not bonus_content_found:
-                for name in zf.namelist():
-                    base_name = os.path.basename(name)
-                    if base_name not in ["toc.xhtml", "copyright.xhtml"]:
-                        continue
+        if not bonus_content_found:
+            for name in namelist:
+                base_name = os.path.basename(name)
+                if base_name not in ["toc.xhtml", "copyright.xhtml"]:
+                    continue
 
-                    with zf.open(name) as file:
-                        file_contents = file.read().decode("utf-8")
-                        if base_name == "toc.xhtml":
-                            if "j-novel" in file_contents.lower() and re.search(
-                                r"(Bonus\s+((Color\s+)?Illustrations?|(Short\s+)?Stories))",
-                                file_contents,
-                                re.IGNORECASE,
-                            ):
-                                bonus_content_found = True
-                                break
-                        elif base_name == "copyright.xhtml":
-                            if "premium" in file_contents.lower() and re.search(
-                                r"(Premium(\s)+(E?-?Book|Epub))",
-                                file_contents,
-                                re.IGNORECASE,
-                            ):
-                                bonus_content_found = True
-                                break
+                with zf.open(name) as file:
+                    file_contents = file.read().decode("utf-8")
+                    if base_name == "toc.xhtml":
+                        if "j-novel" in file_contents.lower() and re.search(
+                            r"(Bonus\s+((Color\s+)?Illustrations?|(Short\s+)?Stories))",
+                            file_contents,
+                            re.IGNORECASE,
+                        ):
+                            bonus_content_found = True
+                            break
+                    elif base_name == "copyright.xhtml":
+                        if "premium" in file_contents.lower() and re.search(
+                            r"(Premium(\s)+(E?-?Book|Epub))",
+                            file_contents,
+                            re.IGNORECASE,
+                        ):
+                            bonus_content_found = True
+                            break
     except Exception as e:
         send_message(str(e), error=True)
     return bonus_content_found
@@ -5787,7 +7801,7 @@ def get_zip_comment_cache(zip_file):
     """
     comment = ""
     try:
-        with open(zip_file, "rb") as f:
+        with CountingFile(zip_file) as f:
             # Seek to the end of the file to get its size.
             f.seek(0, os.SEEK_END)
             file_size = f.tell()
@@ -5824,7 +7838,7 @@ def get_zip_comment(zip_file):
     """
     comment = ""
     try:
-        with open(zip_file, "rb") as f:
+        with CountingFile(zip_file) as f:
             # Seek to the end of the file to get its size.
             f.seek(0, os.SEEK_END)
             file_size = f.tell()
@@ -5854,6 +7868,7 @@ def get_zip_comment(zip_file):
 
 
 # Checks for any duplicate releases and deletes the lower ranking one.
+@metered_stage
 def check_for_duplicate_volumes(paths_to_search=[]):
     global grouped_notifications
 
@@ -6129,7 +8144,7 @@ def check_for_duplicate_volumes(paths_to_search=[]):
 
 
 # Regex out underscore from passed string and return it
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def replace_underscores(name):
     # Replace underscores that are preceded and followed by a number with a period
     name = re.sub(r"(?<=\d)_(?=\d)", ".", name)
@@ -6190,7 +8205,7 @@ def get_identifiers(zip_comment):
 
 # Parses the individual words from the passed string and returns them as an array
 # without punctuation, unidecoded, and in lowercase.
-@lru_cache(maxsize=3500)
+@registered_cache()
 def parse_words(user_string):
     words = []
     if user_string:
@@ -6210,7 +8225,7 @@ def parse_words(user_string):
 
 
 # Finds a number of consecutive items in both arrays, or returns False if none are found.
-@lru_cache(maxsize=3500)
+@registered_cache()
 def find_consecutive_items(arr1, arr2, count=3):
     if len(arr1) < count or len(arr2) < count:
         return False
@@ -6290,6 +8305,7 @@ def move_strings_to_top(target_item, item_array):
 
 # Checks for an existing series by pulling the series name from each elidable file in the downloads_folder
 # and comparing it to an existin folder within the user's library.
+@metered_stage
 def check_for_existing_series(
     test_mode=[],
     test_paths=paths,
@@ -6520,17 +8536,17 @@ def check_for_existing_series(
             print(f"\n\t{download_folder} does not exist, skipping...")
             continue
 
-        # Get all the paths
+        # Walk the paths starting with the deepest folders
+        # Helps when purging empty folders, since it won't purge a folder containing subfolders
+        # (read in full up front, as matched items are moved and folders deleted)
         folders = (
-            get_all_folders_recursively_in_dir(download_folder)
+            list(
+                iter_folders_recursively_in_dir(download_folder, order="deepest_first")
+            )
             if not test_mode
             else [{"root": "/test_mode", "dirs": [], "files": test_mode}]
         )
 
-        # Reverse the list so we start with the deepest folders
-        # Helps when purging empty folders, since it won't purge a folder containing subfolders
-        folders.reverse()
-
         # an array of unmatched items, used for skipping subsequent series
         # items that won't match
         unmatched_series = []
@@ -6570,8 +8586,6 @@ def check_for_existing_series(
 
             exclude = None
 
-            similar.cache_clear()
-
             for file in volumes:
                 try:
                     if not file.series_name:
@@ -7272,10 +9286,10 @@ def check_for_existing_series(
         )
 
     # clear lru_cache for parse_words()
-    parse_words.cache_clear()
+    clear_registered_cache(parse_words)
 
     # clear lru_ache for find_consecutive_items()
-    find_consecutive_items.cache_clear()
+    clear_registered_cache(find_consecutive_items)
 
     # clear lru_cache for get_zip_comment_cache()
     get_zip_comment_cache.cache_clear()
@@ -7303,6 +9317,7 @@ def get_series_name(dir):
 # Renames the folders in our download directory.
 # If volume releases are available, it will rename based on those.
 # Otherwise it will fallback to just cleaning the name of any brackets.
+@metered_stage
 def rename_dirs_in_download_folder(paths_to_process=download_folders):
     global grouped_notifications
 
@@ -7404,7 +9419,7 @@ def rename_dirs_in_download_folder(paths_to_process=download_folders):
 
                 if watchdog_toggle:
                     # Update any old paths with the new path
-                    transferred_files = [
+                    transferred_files = TrackedSet(
                         (
                             f.replace(
                                 os.path.join(dirname, basename),
@@ -7414,7 +9429,7 @@ def rename_dirs_in_download_folder(paths_to_process=download_folders):
                             else f
                         )
                         for f in transferred_files
-                    ]
+                    )
 
                     # Add the new folder to transferred dirs
                     transferred_dirs.append(create_folder_obj(new_folder_path))
@@ -7551,14 +9566,14 @@ def rename_dirs_in_download_folder(paths_to_process=download_folders):
 
                 if watchdog_toggle:
                     # Update any old paths with the new path
-                    transferred_files = [
+                    transferred_files = TrackedSet(
                         (
                             f.replace(os.path.join(dirname, basename), new_folder_path)
                             if f.startswith(os.path.join(dirname, basename))
                             else f
                         )
                         for f in transferred_files
-                    ]
+                    )
 
                     # Add the new folder to transferred dirs
                     transferred_dirs.append(create_folder_obj(new_folder_path_two))
@@ -7599,12 +9614,12 @@ def rename_dirs_in_download_folder(paths_to_process=download_folders):
                     check_and_delete_empty_folder(root)
             return result
 
-        # Get all the paths
-        folders = get_all_folders_recursively_in_dir(download_folder)
-
-        # Reverse the list so we start with the deepest folders
+        # Walk the paths starting with the deepest folders
         # Helps when purging empty folders, since it won't purge a folder containing subfolders
-        folders.reverse()
+        # (read in full up front, as folders are renamed and deleted)
+        folders = list(
+            iter_folders_recursively_in_dir(download_folder, order="deepest_first")
+        )
 
         for folder in folders:
             root = folder["root"]
@@ -7792,11 +9807,11 @@ def isint(x):
 
 
 # check if zip file contains ComicInfo.xml
-@lru_cache(maxsize=3500)
+@registered_cache()
 def contains_comic_info(zip_file):
     result = False
     try:
-        with zipfile.ZipFile(zip_file, "r") as zip_ref:
+        with open_zip(zip_file) as zip_ref:
             if "comicinfo.xml" in map(str.lower, zip_ref.namelist()):
                 result = True
     except (zipfile.BadZipFile, FileNotFoundError) as e:
@@ -7808,7 +9823,7 @@ def contains_comic_info(zip_file):
 def get_file_from_zip(zip_file, searches, extension=None, allow_base=True):
     result = None
     try:
-        with zipfile.ZipFile(zip_file, "r") as z:
+        with open_zip(zip_file) as z:
             # Filter out any item that doesn't end in the specified extension
             file_list = [
                 item
@@ -7908,6 +9923,7 @@ def parse_html_tags(html):
 
 
 # Renames files.
+@metered_stage
 def rename_files(
     only_these_files=[], download_folders=download_folders, test_mode=False
 ):
@@ -8577,13 +10593,88 @@ def rename_files(
                     reorganize_and_rename([file], file.series_name)
 
 
+# Matches a list of user keywords/regexes against names in a single pass,
+# using one named group per keyword so the matching keyword can be reported.
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.pattern = None
+        self.searches = []
+
+        # Keywords that refer back to their own groups can't be combined,
+        # so they're each searched on their own instead.
+        if not any(backreference_pattern.search(keyword) for keyword in keywords):
+            try:
+                self.pattern = re.compile(
+                    "|".join(
+                        f"(?P<keyword_{idx}>{keyword})"
+                        for idx, keyword in enumerate(self.keywords)
+                    ),
+                    re.IGNORECASE,
+                )
+            except Exception:
+                self.pattern = None
+
+        if not self.pattern:
+            self.searches = [
+                (keyword, re.compile(keyword, re.IGNORECASE))
+                for keyword in self.keywords
+            ]
+
+    # Returns the (keyword, matched text) of the first match in the name,
+    # or None if no keyword matched.
+    def search(self, name):
+        if self.pattern:
+            match = self.pattern.search(name)
+            if match:
+                keyword = next(
+                    (
+                        self.keywords[int(group.rsplit("_", 1)[1])]
+                        for group, value in match.groupdict().items()
+                        if value is not None and group.startswith("keyword_")
+                    ),
+                    "",
+                )
+                return keyword, match.group()
+            return None
+
+        for keyword, compiled_search in self.searches:
+            match = compiled_search.search(name)
+            if match:
+                return keyword, match.group()
+        return None
+
+    # Matches every passed name, returning a dict of
+    # name -> (keyword, matched text) for the names that matched.
+    def search_all(self, names):
+        results = {}
+        for name in names:
+            result = self.search(name)
+            if result:
+                results[name] = result
+        return results
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+
+# Returns the KeywordMatcher for the passed keywords, compiled once per keyword list.
+@lru_cache(maxsize=10)
+def get_keyword_matcher(keywords):
+    return KeywordMatcher(keywords)
+
+
+# The matcher for the unacceptable_keywords in settings.py
+unacceptable_keyword_matcher = get_keyword_matcher(tuple(unacceptable_keywords))
+
+
 # Checks for any exception keywords that will prevent the chapter release from being deleted.
 def check_for_exception_keywords(file_name, exception_keywords):
-    pattern = "|".join(exception_keywords)
-    return bool(re.search(pattern, file_name, re.IGNORECASE))
+    return bool(get_keyword_matcher(tuple(exception_keywords)).search(file_name))
 
 
 # Deletes chapter files from the download folder.
+@metered_stage
 def delete_chapters_from_downloads():
     global grouped_notifications
 
@@ -8708,11 +10799,6 @@ def find_and_extract_cover(
         with zip_ref.open(image_path) as image_file_ref:
             return image_file_ref.read()
 
-    # Helper function to save image data to a file
-    def save_image_data(image_path, image_data):
-        with open(image_path, "wb") as image_file_ref_out:
-            image_file_ref_out.write(image_data)
-
     # Helper function to process a cover image and save or return the data
     def process_cover_image(cover_path, image_data=None):
         image_extension = get_file_extension(os.path.basename(cover_path))
@@ -8722,13 +10808,36 @@ def find_and_extract_cover(
         if output_covers_as_webp and image_extension != ".webp":
             image_extension = ".webp"
 
+        if not return_data_only and image_data and should_transcode_covers():
+            # Only change the codec when webp or compression was asked for,
+            # a cover that's only downscaled keeps its codec and extension.
+            codec = (
+                "WEBP"
+                if output_covers_as_webp
+                else "JPEG" if compress_image_option else None
+            )
+            try:
+                image_data = transcode_image(
+                    image_data,
+                    codec,
+                    quality=(
+                        image_quality if compress_image_option else cover_output_quality
+                    ),
+                    max_size=(cover_max_width, cover_max_height),
+                    force=compress_image_option,
+                )
+            except Exception as e:
+                send_message(
+                    f"Failed to transcode cover image {cover_path}: {e}", error=True
+                )
+                return None
+            if codec:
+                image_extension = cover_codec_extensions[codec]
+
         output_path = os.path.join(file.root, file.extensionless_name + image_extension)
 
         if not return_data_only:
-            save_image_data(output_path, image_data)
-            if compress_image_option:
-                result = compress_image(output_path, image_quality)
-                return result if result else output_path
+            write_file_atomically(output_path, image_data)
             return output_path
         elif image_data:
             compressed_data = compress_image(output_path, raw_data=image_data)
@@ -8753,6 +10862,20 @@ def find_and_extract_cover(
             )
         )
 
+    # Helper function to rank an image by the first cover pattern it matches
+    # Lower is better, images that match no pattern are ranked last.
+    def get_cover_rank(image_basename):
+        if (
+            novel_cover_path and image_basename == novel_cover_path
+        ) or file.extension in manga_extensions:
+            return 0
+
+        for rank, pattern in enumerate(compiled_cover_patterns):
+            if pattern.pattern == image_basename or pattern.search(image_basename):
+                return rank
+
+        return len(compiled_cover_patterns)
+
     # Check if the file exists
     if not os.path.isfile(file.path):
         send_message(f"\nFile: {file.path} does not exist.", error=True)
@@ -8769,7 +10892,7 @@ def find_and_extract_cover(
     )
 
     # Open the zip file
-    with zipfile.ZipFile(file.path, "r") as zip_ref:
+    with open_zip(file.path) as zip_ref:
         # Filter and sort files in the zip archive
         zip_list = filter_files(zip_ref.namelist())
         zip_list = sorted(zip_list)
@@ -8783,58 +10906,27 @@ def find_and_extract_cover(
                     zip_list.insert(0, item)
                     break
 
-        # Set of blank images
-        blank_images = set()
+        # Rank every member by the first cover pattern it matches in a single pass,
+        # the sort is stable, so ties keep the order of zip_list.
+        # Members that don't match any pattern are kept at the end as fallbacks.
+        ranked_list = sorted(
+            zip_list, key=lambda x: get_cover_rank(os.path.basename(x))
+        )
 
-        # Iterate through the files in the zip archive
-        for pattern in compiled_cover_patterns:
-            # Check if the file matches any cover pattern
-            for image_file in zip_list:
-                image_basename = os.path.basename(image_file)
-                is_novel_cover = novel_cover_path and image_basename == novel_cover_path
+        check_blank = (
+            blank_image_check and blank_white_image_path and blank_black_image_path
+        )
 
-                if (
-                    is_novel_cover
-                    or file.extension in manga_extensions
-                    or pattern.pattern == image_basename
-                    or pattern.search(image_basename)
-                ):
-                    # Check if the image is blank
-                    if (
-                        blank_image_check
-                        and blank_white_image_path
-                        and blank_black_image_path
-                    ):
-                        image_data = get_image_data(image_file)
-                        if is_blank_image(image_data):
-                            blank_images.add(image_file)
-                            break
-                    image_data = get_image_data(image_file)
-                    result = process_cover_image(image_file, image_data)
-                    if result:
-                        return result
+        # Iterate through the ranked files in the zip archive,
+        # each candidate is only decompressed once.
+        for image_file in ranked_list:
+            image_data = get_image_data(image_file)
 
-        # Find a non-blank default cover
-        default_cover_path = None
-        for test_file in zip_list:
-            if test_file in blank_images:
+            # Skip the image if it's blank
+            if check_blank and is_blank_image(image_data):
                 continue
 
-            image_data = get_image_data(test_file)
-
-            # Check if the user has enabled the option to compare detected covers to blank images
-            if blank_image_check:
-                if not is_blank_image(image_data):
-                    default_cover_path = test_file
-                    break
-            else:
-                default_cover_path = test_file
-                break
-
-        # Process the default cover if found
-        if default_cover_path:
-            image_data = get_image_data(default_cover_path)
-            result = process_cover_image(default_cover_path, image_data)
+            result = process_cover_image(image_file, image_data)
             if result:
                 return result
 
@@ -8842,7 +10934,7 @@ def find_and_extract_cover(
 
 
 # Returns the highest volume number and volume part number of a release in a list of volume releases
-@lru_cache(maxsize=3500)
+@registered_cache()
 def get_highest_release(releases, is_chapter_directory=False):
     highest_num = ""
 
@@ -8870,7 +10962,7 @@ def get_highest_release(releases, is_chapter_directory=False):
 
 
 # Series covers that have been checked and can be skipped.
-checked_series = []
+checked_series = TrackedSet()
 
 
 # takes a time.time, gets the current time and prints the execution time,
@@ -8879,6 +10971,7 @@ def print_execution_time(start_time, function_name):
 
 
 # Extracts the covers out from our manga and novel files.
+@metered_stage
 def extract_covers(paths_to_process=paths):
     global checked_series
     global series_cover_path
@@ -8994,7 +11087,7 @@ def extract_covers(paths_to_process=paths):
             print(f"\nERROR: {path} is an invalid path.\n")
             continue
 
-        checked_series = []
+        checked_series = TrackedSet()
         os.chdir(path)
 
         # Traverse the directory tree rooted at the path
@@ -9174,6 +11267,7 @@ def get_modification_date(path):
 
 
 # Handles the processing of cover extraction for a file.
+@file_event("extract_cover", get_path=lambda file, *args, **kwargs: file.path)
 def process_cover_extraction(
     file,
     has_multiple_volume_ones,
@@ -9581,6 +11675,7 @@ def print_stats():
 
 
 # Deletes any file with an extension in unacceptable_keywords from the download_folders
+@metered_stage
 def delete_unacceptable_files():
     global grouped_notifications
 
@@ -9615,50 +11710,46 @@ def delete_unacceptable_files():
                     skip_remove_unaccepted_file_types=True,
                     keep_images_in_just_these_files=True,
                 )
-                for file in files:
+
+                matches = unacceptable_keyword_matcher.search_all(files)
+
+                for file, (keyword, matched_text) in matches.items():
                     file_path = os.path.join(root, file)
                     if not os.path.isfile(file_path):
                         continue
 
-                    extension = get_file_extension(file)
-                    for keyword in unacceptable_keywords:
-                        unacceptable_keyword_search = re.search(
-                            keyword, file, re.IGNORECASE
-                        )
-                        if unacceptable_keyword_search:
-                            send_message(
-                                f"\tUnacceptable: {unacceptable_keyword_search.group()} match found in {file}\n\t\tDeleting file from: {root}",
-                                discord=False,
-                            )
-                            embed = handle_fields(
-                                DiscordEmbed(
-                                    title="Unacceptable Match Found",
-                                    color=yellow_color,
-                                ),
-                                fields=[
-                                    {
-                                        "name": "Found Regex/Keyword Match",
-                                        "value": f"```{unacceptable_keyword_search.group()}```",
-                                        "inline": False,
-                                    },
-                                    {
-                                        "name": "In",
-                                        "value": f"```{file}```",
-                                        "inline": False,
-                                    },
-                                    {
-                                        "name": "Location",
-                                        "value": f"```{root}```",
-                                        "inline": False,
-                                    },
-                                ],
-                            )
-                            grouped_notifications = group_notification(
-                                grouped_notifications,
-                                Embed(embed, None),
-                            )
-                            remove_file(file_path)
-                            break
+                    send_message(
+                        f"\tUnacceptable: {matched_text} match found in {file}\n\t\tDeleting file from: {root}",
+                        discord=False,
+                    )
+                    embed = handle_fields(
+                        DiscordEmbed(
+                            title="Unacceptable Match Found",
+                            color=yellow_color,
+                        ),
+                        fields=[
+                            {
+                                "name": "Found Regex/Keyword Match",
+                                "value": f"```{matched_text}```",
+                                "inline": False,
+                            },
+                            {
+                                "name": "In",
+                                "value": f"```{file}```",
+                                "inline": False,
+                            },
+                            {
+                                "name": "Location",
+                                "value": f"```{root}```",
+                                "inline": False,
+                            },
+                        ],
+                    )
+                    grouped_notifications = group_notification(
+                        grouped_notifications,
+                        Embed(embed, None),
+                    )
+                    remove_file(file_path)
             for root, dirs, files in scandir.walk(path):
                 files, dirs = process_files_and_folders(
                     root,
@@ -9674,6 +11765,21 @@ def delete_unacceptable_files():
 
 
 class BookwalkerBook:
+    __slots__ = (
+        "title",
+        "original_title",
+        "volume_number",
+        "part",
+        "date",
+        "is_released",
+        "price",
+        "url",
+        "thumbnail",
+        "book_type",
+        "description",
+        "preview_image_url",
+    )
+
     def __init__(
         self,
         title,
@@ -9856,7 +11962,7 @@ def get_subtitle_from_dash(title, replace=False):
 # Extracts the subtitle from a file.name
 # (year required in brackets at the end of the subtitle)
 # EX: Sword Art Online v13 - Alicization Dividing [2018].epub -> Alicization Dividing
-@lru_cache(maxsize=3500)
+@registered_cache()
 def get_subtitle_from_title(file, publisher=None):
     subtitle = ""
 
@@ -10518,6 +12624,7 @@ def search_bookwalker(
 
 
 # Checks the library against bookwalker for any missing volumes that are released or on pre-order
+@metered_stage
 def check_for_new_volumes_on_bookwalker():
     global discord_embed_limit
 
@@ -10748,22 +12855,14 @@ def check_for_new_volumes_on_bookwalker():
 
         os.chdir(path)
 
-        folders = get_all_folders_recursively_in_dir(path)
-
-        if not folders:
-            continue
-
-        # sort the folders by "root"
-        folders = sorted(folders, key=lambda k: k["root"])
+        folders = iter_folders_recursively_in_dir(path, order="sorted")
 
         for dir_index, folder in enumerate(folders, start=1):
             root = folder["root"]
             dirs = folder["dirs"]
             files = clean_and_sort(root, folder["files"], chapters=False, sort=True)[0]
 
-            print(
-                f"\n\t[Folder {dir_index} of {len(folders)} - Path {path_index} of {len(paths_clean)}]"
-            )
+            print(f"\n\t[Folder {dir_index} - Path {path_index} of {len(paths_clean)}]")
             print(f"\tPath: {root}")
 
             if not files:
@@ -10849,6 +12948,7 @@ def check_for_new_volumes_on_bookwalker():
 
 
 # caches all roots encountered when walking paths
+@metered_stage
 def cache_existing_library_paths(
     paths=paths, download_folders=download_folders
 ):
@@ -10885,6 +12985,7 @@ def cache_existing_library_paths(
 
 # Sends scan requests to komga for all passed-in libraries
 # Requires komga settings to be set in settings.py
+@metered_stage
 def scan_komga_library(library_id, library_name):
     if not komga_ip:
         send_message(
@@ -11002,6 +13103,7 @@ def get_komga_libraries(first_run=True):
 
 
 # Generates a list of all release groups or publishers.
+@metered_stage
 def generate_rename_lists(skipped_release_group_files=[], skipped_publisher_files=[]):
     global release_groups, publishers
 
@@ -11246,7 +13348,7 @@ def has_one_set_of_numbers(string, chapter=False, file=None, subtitle=None):
 
 
 # Check if there is more than one set of numbers in the string
-@lru_cache(maxsize=3500)
+@registered_cache(persistable=True)
 def has_multiple_numbers(file_name):
     return len(re.findall(r"\d+\.0+[0-9]+|\d+\.[0-9]+|\d+", file_name)) > 1
 
@@ -11399,17 +13501,22 @@ def prep_images_for_similarity(
 
 
 # Extracts a supported archive to a temporary directory.
+@file_event("extract")
 def extract(file_path, temp_dir, extension):
     successfull = False
     try:
+        # rarfile and py7zr are given the path, so they're
+        # recorded as one read of the whole archive
         if extension in rar_extensions:
             with rarfile.RarFile(file_path) as rar:
                 rar.extractall(temp_dir)
                 successfull = True
+            record_io(file_path, get_file_size(file_path) or 0, opens=1)
         elif extension in seven_zip_extensions:
             with py7zr.SevenZipFile(file_path, "r") as archive:
                 archive.extractall(temp_dir)
                 successfull = True
+            record_io(file_path, get_file_size(file_path) or 0, opens=1)
     except Exception as e:
         send_message(f"Error extracting {file_path}: {e}", error=True)
     return successfull
@@ -11433,6 +13540,7 @@ def compress(temp_dir, cbz_filename):
 
 
 # Converts supported archives to CBZ.
+@metered_stage
 def convert_to_cbz():
     global transferred_files, grouped_notifications
 
@@ -11565,9 +13673,12 @@ def convert_to_cbz():
                                     for file in seven_zip.getnames():
                                         if get_file_extension(file):
                                             source_file_list.append(file)
+                            # listing only reads the archive's headers,
+                            # so only the open is recorded
+                            record_io(source_file, opens=1)
 
                         if os.path.isfile(repacked_file):
-                            with zipfile.ZipFile(repacked_file) as zip:
+                            with open_zip(repacked_file) as zip:
                                 for file in zip.namelist():
                                     if get_file_extension(file):
                                         repacked_file_list.append(file)
@@ -11603,7 +13714,7 @@ def convert_to_cbz():
                         hashes_verified = False
 
                         # Verify hashes of all files inside the cbz file
-                        with zipfile.ZipFile(repacked_file) as zip:
+                        with open_zip(repacked_file) as zip:
                             for file in zip.namelist():
                                 if get_file_extension(file):
                                     hash = get_file_hash(repacked_file, True, file)
@@ -11713,6 +13824,7 @@ def convert_to_cbz():
 
 # Goes through each file in download_folders and checks for an incorrect file extension
 # based on the file header. If the file extension is incorrect, it will rename the file.
+@metered_stage
 def correct_file_extensions():
     global transferred_files, grouped_notifications
 
@@ -11809,6 +13921,7 @@ def correct_file_extensions():
 
 # Checks existing series within existing libraries to see if their type matches the library they're in
 # If not, it moves the series to the appropriate library
+@metered_stage
 def move_series_to_correct_library(paths_to_search=paths_with_types):
     global grouped_notifications
     global moved_folders, moved_files
@@ -12016,6 +14129,7 @@ def is_root_present(root_path, target_path):
 
 # Optional features below, use at your own risk.
 # Activate them in settings.py
+@profiled_stage
 def main():
     global processed_files
     global moved_files
@@ -12024,15 +14138,16 @@ def main():
     global transferred_files
     global transferred_dirs
     global komga_libraries
-    global publishers_joined
-    global release_groups_joined
-    global publishers_joined_regex, release_groups_joined_regex
+    global publishers_matcher, release_groups_matcher
     global libraries_to_scan
 
-    processed_files = []
-    moved_files = []
+    processed_files = TrackedSet()
+    moved_files = TrackedSet()
     download_folder_in_paths = False
 
+    # Load the warmed caches saved by a previous run
+    load_persisted_caches()
+
     release_groups_path = os.path.join(LOGS_DIR, "release_groups.txt")
     publishers_path = os.path.join(LOGS_DIR, "publishers.txt")
     skipped_release_group_files_path = os.path.join(
@@ -12068,7 +14183,6 @@ def main():
         release_groups_read = get_lines_from_file(release_groups_path)
         if release_groups_read:
             release_groups = release_groups_read
-            release_groups_joined = "|".join(map(re.escape, release_groups))
             print(
                 f"\tLoaded {len(release_groups)} release groups from release_groups.txt"
             )
@@ -12078,18 +14192,11 @@ def main():
         publishers_read = get_lines_from_file(publishers_path)
         if publishers_read:
             publishers = publishers_read
-            publishers_joined = "|".join(map(re.escape, publishers))
             print(f"\tLoaded {len(publishers)} publishers from publishers.txt")
 
-    # Pre-compiled publisher regex
-    publishers_joined_regex = re.compile(
-        rf"(?<=[\(\[\{{])({publishers_joined})(?=[\)\]\}}])", re.IGNORECASE
-    )
-
-    # Pre-compile release group regex
-    release_groups_joined_regex = re.compile(
-        rf"(?<=[\(\[\{{])({release_groups_joined})(?=[\)\]\}}])", re.IGNORECASE
-    )
+    # Build the bracketed publisher and release group matchers
+    publishers_matcher = BracketedLiteralMatcher(publishers)
+    release_groups_matcher = BracketedLiteralMatcher(release_groups)
 
     # Correct any incorrect file extensions
     if correct_file_extensions_toggle:
@@ -12166,11 +14273,15 @@ def main():
     if watchdog_toggle:
         # remove any deleted/renamed/moved files
         if transferred_files:
-            transferred_files = [x for x in transferred_files if os.path.isfile(x)]
+            transferred_files = TrackedSet(
+                x for x in transferred_files if os.path.isfile(x)
+            )
 
         # remove any deleted/renamed/moved directories
         if transferred_dirs:
-            transferred_dirs = [x for x in transferred_dirs if os.path.isdir(x.root)]
+            transferred_dirs = TrackedSet(
+                x for x in transferred_dirs if os.path.isdir(x.root)
+            )
 
     if (
         move_series_to_correct_library_toggle
@@ -12203,11 +14314,7 @@ def main():
                 if paths_to_trigger:
                     extract_covers(paths_to_process=paths_to_trigger)
             else:
-                if profile_code == "extract_covers()":
-                    cProfile.run(profile_code, sort="cumtime")
-                    exit()
-                else:
-                    extract_covers()
+                extract_covers()
                 print_stats()
 
     # Check for missing volumes in the library (local solution)
@@ -12255,7 +14362,18 @@ def main():
     libraries_to_scan = []
 
     # clear lru_cache for contains_comic_info()
-    contains_comic_info.cache_clear()
+    clear_registered_cache(contains_comic_info)
+
+    # Report the cache hit rates and save the warmed caches for the next run
+    print_cache_stats()
+    save_persisted_caches()
+
+    # Report the I/O of each stage and the files that read the most
+    print_io_stats()
+
+    # Write the per-stage metrics and file events for this run
+    write_metrics_file()
+    event_log.flush()
 
 
 # Checks that the user has the required settings in settings.py
@@ -12292,6 +14410,9 @@ def check_required_settings():
 if __name__ == "__main__":
     parse_my_args()  # parses the user's arguments
 
+    if metrics_port:
+        start_metrics_server(metrics_port)
+
     if settings:
         check_required_settings()
 
@@ -12301,9 +14422,4 @@ if __name__ == "__main__":
             watch = Watcher()
             watch.run()
     else:
-        if profile_code == "main()":
-            # run with cprofile and sort by cumulative time
-            cProfile.run(profile_code, sort="cumtime")
-            exit()
-        else:
-            main()
+        main()
@@ -206,6 +206,60 @@ rename_zip_to_cbz = True
 # Requires: --watchdog "True" and check_for_existing_series_toggle = True
 auto_classify_watchdog_paths = False
 
+# The default maximum number of entries kept by each in-memory cache
+# (file name parsing, string normalization, similarity scores, etc.)
+# Raise it for large libraries to avoid constant cache eviction. (0 = unlimited)
+default_cache_size = 25000
+
+# Per-cache size overrides, keyed by the cached function's name.
+# EX: {"similar": 100000, "normalize_str": 50000}
+cache_sizes = {}
+
+# Saves the warmed string caches to the logs folder at the end of each run,
+# and loads them back in on startup, so restarts don't begin with cold caches.
+# They're discarded automatically whenever settings.py or the script version changes.
+persist_caches = False
+
+# The quality extracted covers are transcoded at, when they're transcoded.
+# (the cli's image quality is used instead when compressing images)
+# Can also be passed in via cli with --cover_quality.
+cover_output_quality = 85
+
+# The maximum width and height of extracted covers, larger covers are
+# downscaled to fit before being written. (0 = no limit)
+# Can also be passed in via cli with --cover_max_size WIDTHxHEIGHT.
+cover_max_width = 0
+cover_max_height = 0
+
+# Images at or under this size in bytes, or JPEGs already saved at or under
+# the requested quality, are left as is when compressing. (0 = no size limit)
+# Can also be passed in via cli with --compress_skip_size.
+compress_image_skip_size = 150 * 1024
+
+# Serves the per-stage metrics (run times, files, bytes read, cache hits)
+# in the Prometheus text format on this local port. (None to disable)
+# Can also be passed in via cli with --metrics_port.
+metrics_port = None
+
+# The stages to profile, by function name. Each profiled run writes a .pstats
+# file and a collapsed-stack file (for flamegraph.pl or speedscope) to logs/profiles.
+# ("main" profiles a whole run, "all" profiles every stage separately)
+# EX: ["check_for_duplicate_volumes", "extract_covers"]
+# Can also be passed in via cli with --profile.
+profile_stages = []
+
+# Traces the peak memory of each stage with tracemalloc. (slows down runs)
+# Can also be passed in via cli with --profile_memory.
+profile_memory = False
+
+# Logs an event for each file handled in a run to logs/events.jsonl,
+# with its stage, action, outcome, duration and size. (requires log_to_file)
+log_file_events = True
+
+# The size in bytes logs/events.jsonl can reach before it's moved
+# to logs/events.jsonl.1 and a new one is started. (0 = no limit)
+log_file_events_max_size = 10 * 1024 * 1024
+
 # qBittorrent API credentials
 # Requires: uncheck_non_qbit_upgrades_toggle = True
 #           check_for_existing_series_toggle = True
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import csv
 
+import komga_cover_extractor
 from komga_cover_extractor import *
 
 
@@ -248,6 +249,22 @@ def test_get_file_extension():
     assert get_file_extension("test.jpg.png.zip") == ".zip"
 
 
+# test def sniff_header_extension(header):
+def test_sniff_header_extension():
+    assert sniff_header_extension(b"PK\x03\x04" + b"\x00" * 54) == ".cbz"
+    assert (
+        sniff_header_extension(
+            b"PK\x03\x04" + b"\x00" * 26 + b"mimetypeapplication/epub+zip"
+        )
+        == ".epub"
+    )
+    assert sniff_header_extension(b"Rar!\x1a\x07\x00") == ".cbr"
+    assert sniff_header_extension(b"Rar!\x1a\x07\x01\x00") == ".cbr"
+    assert sniff_header_extension(b"7z\xbc\xaf\x27\x1c\x00\x04") == ".7z"
+    assert sniff_header_extension(b"%PDF-1.7") is None
+    assert sniff_header_extension(b"") is None
+
+
 # test def get_extensionless_name(file):
 def test_get_extensionless_name():
     assert get_extensionless_name("test.jpg") == "test"
@@ -954,6 +971,140 @@ def test_get_release_number_cache():
     )
 
 
+# test class BoundedMemo
+def test_bounded_memo():
+    memo = BoundedMemo(maxsize=2)
+    assert memo.lookup("a") == (False, None)
+    memo.store("a", 1)
+    memo.store("b", 2)
+    assert memo.lookup("a") == (True, 1)
+    memo.store("c", 3)  # evicts "b", the least recently used
+    assert memo.lookup("b") == (False, None)
+    assert memo.lookup("c") == (True, 3)
+    assert memo.cache_info() == CacheInfo(hits=2, misses=2, maxsize=2, currsize=2)
+    memo.cache_clear()
+    assert memo.cache_info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=0)
+
+
+# test def registered_cache(maxsize=None, persistable=True):
+# with save_persisted_caches() and load_persisted_caches()
+def test_persisted_caches():
+    saved = (
+        komga_cover_extractor.persist_caches,
+        komga_cover_extractor.cache_manager,
+        komga_cover_extractor.persistable_caches,
+        komga_cover_extractor.script_version,
+    )
+    calls = []
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            komga_cover_extractor.persist_caches = True
+            komga_cover_extractor.cache_manager = CacheManager(temp_dir)
+            komga_cover_extractor.persistable_caches = {}
+
+            @registered_cache(persistable=True)
+            def persisted_test_cache(x):
+                calls.append(x)
+                return x * 2
+
+            assert persisted_test_cache(2) == 4
+            fingerprint = get_cache_fingerprint()
+            assert get_cache_fingerprint() == fingerprint
+            save_persisted_caches()
+
+            # a new run, with the values loaded instead of computed
+            persisted_test_cache.cache_clear()
+            komga_cover_extractor.persisted_caches_loaded = False
+            load_persisted_caches()
+            assert persisted_test_cache(2) == 4
+            assert calls == [2]
+
+            # a changed fingerprint discards the persisted values
+            komga_cover_extractor.script_version = (0, 0, 0)
+            assert get_cache_fingerprint() != fingerprint
+            persisted_test_cache.cache_clear()
+            komga_cover_extractor.persisted_caches_loaded = False
+            load_persisted_caches()
+            assert persisted_test_cache(2) == 4
+            assert calls == [2, 2]
+
+            komga_cover_extractor.cache_manager.cache.close()
+    finally:
+        (
+            komga_cover_extractor.persist_caches,
+            komga_cover_extractor.cache_manager,
+            komga_cover_extractor.persistable_caches,
+            komga_cover_extractor.script_version,
+        ) = saved
+        komga_cover_extractor.persisted_caches_loaded = False
+        cache_registry.pop("persisted_test_cache", None)
+
+
+# test class LibraryType and def get_library_type(files, required_match_percentage=None):
+def test_get_library_type():
+    manga_type = LibraryType(
+        "manga", [".cbz"], [r"\(digital\)"], [r"Webtoon"], match_percentage=90
+    )
+    assert manga_type.matches("Berserk v01 (Digital).cbz", ".cbz")
+    assert not manga_type.matches("Berserk v01 (Digital).epub", ".epub")
+    assert not manga_type.matches("Berserk v01.cbz", ".cbz")
+    assert not manga_type.matches("Berserk v01 (Digital) Webtoon.cbz", ".cbz")
+
+    # Counts the files each library type checks
+    checked = []
+
+    class CountingLibraryType(LibraryType):
+        def matches(self, file, extension):
+            checked.append(file)
+            return super().matches(file, extension)
+
+    saved_library_types = komga_cover_extractor.library_types
+    try:
+        komga_cover_extractor.library_types = [
+            CountingLibraryType(
+                "manga", [".cbz"], [r"\(Digital\)"], [], match_percentage=50
+            )
+        ]
+        digital_files = [f"Berserk v{i:02} (Digital).cbz" for i in range(1, 11)]
+
+        # Stops once half of the files have matched
+        assert get_library_type(digital_files).name == "manga"
+        assert len(checked) == 5
+
+        # Stops once half of the files can no longer match
+        checked.clear()
+        files = [f"Berserk v{i:02}.cbz" for i in range(1, 7)] + digital_files[:4]
+        assert get_library_type(files) is None
+        assert len(checked) == 6
+    finally:
+        komga_cover_extractor.library_types = saved_library_types
+
+
+# test def parse_release_name(name, root="", test_mode=False):
+def test_parse_release_name():
+    record = parse_release_name(
+        "Series Name v01-03 Part 2 (2019) (Digital) (Group).cbz", test_mode=True
+    )
+    assert record.file_type == "volume"
+    assert record.release_number == (1, 3)
+    assert record.series_name == "Series Name"
+    assert record.release_year == "2019"
+    assert record.volume_part == 2
+    assert record.multi_volume == True
+    assert record.extension == ".cbz"
+
+    record = parse_release_name("Series Name c015 (2021) (Group).cbz", test_mode=True)
+    assert record.file_type == "chapter"
+    assert record.release_number == 15
+    assert record.series_name == "Series Name"
+
+    try:
+        record.series_name = "Other Name"
+        assert False
+    except AttributeError:
+        pass
+
+
 # test def get_volume_year(name):
 def test_get_release_year():
     assert get_release_year("DAR v01 (2022).cbz") == "2022"
@@ -977,6 +1128,16 @@ def test_get_extra_from_group():
     assert get_extra_from_group("DAR v01 (2022) (fixed) (1r0n).cbz", ["1r0n"]) == "1r0n"
 
 
+# test class BracketedLiteralMatcher
+def test_bracketed_literal_matcher():
+    matcher = BracketedLiteralMatcher(["danke-Empire", "1r0n", "Yen Press"])
+    name = "DAR v01 (2022) [yen press] (1r0n) (danke-Empire).cbz"
+    assert matcher.search(name) == "yen press"
+    assert matcher.findall(name) == ["yen press", "1r0n", "danke-Empire"]
+    assert matcher.search("DAR v01 1r0n.cbz") is None
+    assert matcher.findall("DAR v01 (1r0nx).cbz") == []
+
+
 # test def get_file_part(file, chapter=False):
 def test_get_file_part():
     assert get_file_part("DAR v01 (2022) (fixed) (danke-Empire).cbz") == ""
@@ -1006,6 +1167,50 @@ def test_get_keyword_score():
     )
 
 
+# test def get_keyword_score(name, file_type): with the compiled scanner
+def test_get_keyword_score_compiled():
+    saved_keywords, saved_searches = list(ranked_keywords), list(compiled_searches)
+    try:
+        ranked_keywords[:] = [
+            Keyword(r"Digital", 1),
+            Keyword(r"Digital-Compilation", 2),
+            Keyword(r"\(f\)", 0.5, "volume"),
+            Keyword(r"c(\d+)\s\(\1\)", 3, "chapter"),
+        ]
+        compiled_searches[:] = [
+            re.compile(keyword.name, re.IGNORECASE) for keyword in ranked_keywords
+        ]
+        compiled_ranked_keywords.clear()
+        clear_registered_cache(get_keyword_score)
+
+        # overlapping keywords are each counted
+        name = "DAR v01 (Digital-Compilation) (f).cbz"
+        result = get_keyword_score(name, "volume")
+        assert result.total_score == 3.5
+        assert [tag.name for tag in result.keywords] == [
+            "Digital",
+            "Digital-Compilation",
+            "(f)",
+        ]
+
+        # the score is memoized per name and file type
+        assert get_keyword_score(name, "volume") is result
+        assert get_keyword_score(name, "chapter").total_score == 3
+        assert get_keyword_score.cache_info().hits == 1
+
+        # no keyword matches
+        assert get_keyword_score("DAR v01.cbz", "volume").total_score == 0
+
+        # a backreference keyword falls back to the per-keyword searches
+        assert compiled_ranked_keywords["chapter"][1] is None
+        assert get_keyword_score("DAR c05 (05).cbz", "chapter").total_score == 3
+    finally:
+        ranked_keywords[:] = saved_keywords
+        compiled_searches[:] = saved_searches
+        compiled_ranked_keywords.clear()
+        clear_registered_cache(get_keyword_score)
+
+
 # test def remove_dual_space(s):
 def test_remove_dual_space():
     assert remove_dual_space("test  test") == "test test"
@@ -1014,6 +1219,27 @@ def test_remove_dual_space():
 # test def normalize_str(s):
 def test_normalize_str():
     assert normalize_str("The Sword Saint") == "Sword Saint"
+    assert normalize_str("Book Girl Light Novel") == "Book Girl Light Novel"
+    assert normalize_str("The Deluxe Manga Edition") == "Manga"
+    assert normalize_str("The Sword Saint", skip_common_words=True) == "The Sword Saint"
+
+    # words are removed in order, so "Book" goes as a type keyword
+    # before "Book walker" is checked as a storefront keyword
+    assert normalize_str("Sword Saint Book walker") == "Sword Saint walker"
+    assert normalize_str("Sword Saint BookWalker") == "Sword Saint"
+    assert normalize_str("Book Girl book  walker") == "Book Girl walker"
+    assert normalize_str("Special Book BOOK WALKER A") == ""
+    assert normalize_str("Book Novel book  walker 5th no &") == "&"
+    assert (
+        normalize_str(
+            "Special Book BOOK WALKER A",
+            skip_common_words=True,
+            skip_editions=True,
+            skip_japanese_particles=True,
+            skip_misc_words=True,
+        )
+        == "Special WALKER A"
+    )
 
 
 # test def clean_str(string):
@@ -1159,6 +1385,108 @@ def test_parse_html_tags():
     }
 
 
+# test def parse_opf_tags(opf_root):
+def test_parse_opf_tags():
+    opf = etree.fromstring(
+        b'<package xmlns="http://www.idpf.org/2007/opf">'
+        b'<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        b"<dc:date>2019-05-01</dc:date><dc:Publisher>Yen Press</dc:Publisher>"
+        b"</metadata></package>"
+    )
+    tags = parse_opf_tags(opf)
+    assert tags["dc:date"] == "2019-05-01"
+    assert tags["dc:publisher"] == "Yen Press"
+    assert tags["package"] == "2019-05-01Yen Press"
+
+
+# test def parse_epub_descriptor(novel_path): with a broken container.xml
+def test_parse_epub_descriptor_broken_container():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        epub_path = os.path.join(temp_dir, "test.epub")
+        with zipfile.ZipFile(epub_path, "w") as epub:
+            epub.writestr("META-INF/container.xml", "<container><rootfiles><rootfile")
+            epub.writestr(
+                "OEBPS/content.opf",
+                '<package xmlns="http://www.idpf.org/2007/opf">'
+                '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+                "<dc:publisher>J-Novel Club</dc:publisher>"
+                '<meta name="cover" content="cover-image"/></metadata>'
+                '<manifest><item id="cover-image" href="cover.jpg"/></manifest>'
+                "</package>",
+            )
+            epub.writestr(
+                "OEBPS/copyright.xhtml", "<p>This is a Premium Ebook edition.</p>"
+            )
+
+        descriptor = parse_epub_descriptor(epub_path)
+        assert descriptor["rootfile_path"] == "OEBPS/content.opf"
+        assert descriptor["cover_href"] == "OEBPS/cover.jpg"
+        assert descriptor["metadata"]["dc:publisher"] == "J-Novel Club"
+        assert descriptor["is_premium"] == True
+
+
+# test def transcode_image(raw_data, codec="JPEG", quality=85, max_size=(0, 0), force=False):
+def test_transcode_image():
+    buffer = io.BytesIO()
+    Image.new("RGBA", (400, 600), (255, 0, 0, 255)).save(buffer, format="PNG")
+    png_data = buffer.getvalue()
+
+    webp_data = transcode_image(png_data, "WEBP", max_size=(200, 200))
+    with Image.open(io.BytesIO(webp_data)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (133, 200)
+
+    jpg_data = transcode_image(png_data, "JPEG")
+    with Image.open(io.BytesIO(jpg_data)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (400, 600)
+
+    # Already in the requested codec and within the limits
+    assert transcode_image(jpg_data, "JPEG", max_size=(400, 600)) == jpg_data
+
+    # No codec keeps the one the image is already in
+    resized_data = transcode_image(png_data, None, max_size=(200, 200))
+    with Image.open(io.BytesIO(resized_data)) as image:
+        assert image.format == "PNG"
+        assert image.size == (133, 200)
+
+
+# test def write_file_atomically(file_path, data):
+def test_write_file_atomically():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "cover.jpg")
+        write_file_atomically(file_path, b"new")
+        with open(file_path, "rb") as f:
+            assert f.read() == b"new"
+        assert (
+            os.stat(file_path).st_mode & 0o777
+            == 0o666 & ~komga_cover_extractor.process_umask
+        )
+
+        # an existing file keeps its mode
+        os.chmod(file_path, 0o640)
+        write_file_atomically(file_path, b"replaced")
+        assert os.stat(file_path).st_mode & 0o777 == 0o640
+        assert os.listdir(temp_dir) == ["cover.jpg"]
+
+
+# test def get_jpeg_quality(file_obj):
+def test_get_jpeg_quality():
+    for quality in [25, 40, 75, 90]:
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), (120, 40, 200)).save(
+            buffer, format="JPEG", quality=quality
+        )
+        buffer.seek(0)
+        assert get_jpeg_quality(buffer) == quality
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(buffer, format="PNG")
+    buffer.seek(0)
+    assert get_jpeg_quality(buffer) is None
+    assert get_jpeg_quality(io.BytesIO(b"")) is None
+
+
 # test def check_for_exception_keywords(file_name, exception_keywords):
 def test_check_for_exception_keywords():
     assert (
@@ -1181,6 +1509,17 @@ def test_check_for_exception_keywords():
     )
 
 
+# test class KeywordMatcher
+def test_keyword_matcher():
+    matcher = KeywordMatcher([r"\.txt$", r"Ones?(-|)shot", r"sample"])
+    assert matcher.search("test (One-shot).cbz") == (r"Ones?(-|)shot", "One-shot")
+    assert matcher.search("test v01.cbz") is None
+    assert matcher.search_all(["a.txt", "b.cbz", "SAMPLE.cbz"]) == {
+        "a.txt": (r"\.txt$", ".txt"),
+        "SAMPLE.cbz": ("sample", "SAMPLE"),
+    }
+
+
 # test def has_one_set_of_numbers(string):
 def test_has_one_set_of_numbers():
     assert has_one_set_of_numbers("test 01") == True
@@ -1929,6 +2268,260 @@ def test_contains_brackets():
     assert contains_brackets("test()[]{} test") == True
 
 
+# test def find_missing_volumes(volume_index):
+def test_find_missing_volumes():
+    volume_index = {
+        "/library/A": (3, [1, 2, 5]),
+        "/library/B": (3, [1, 2, 3, 4]),
+        "/library/C": (2, [2, 3.5, 4]),
+        "/library/D": (1, [6]),
+        "/library/E": (2, [3, 3]),
+    }
+    assert find_missing_volumes(volume_index) == {
+        "/library/A": (5, [3, 4]),
+        "/library/C": (4, [1, 3]),
+    }
+    assert find_missing_volumes({}) == {}
+
+
+# test def CacheManager.prune_volume_indexes()
+def test_prune_volume_indexes():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager = CacheManager(os.path.join(temp_dir, "cache"))
+        series_dir = os.path.join(temp_dir, "Series")
+        os.mkdir(series_dir)
+        removed_dir = os.path.join(temp_dir, "Removed Series")
+
+        manager.set_volume_index(series_dir, "fingerprint", 1, (2, [1, 2]))
+        manager.set_volume_index(removed_dir, "fingerprint", 1, (2, [1, 2]))
+        manager.prune_volume_indexes()
+
+        assert manager.get_volume_index(series_dir, "fingerprint", 1) == (2, [1, 2])
+        assert ("volume_index", removed_dir) not in manager.cache
+        manager.cache.close()
+
+
+# test class TrackedSet
+def test_tracked_set():
+    tracked = TrackedSet(["b", "a"])
+    tracked.append("c")
+    tracked.append("a")
+    assert list(tracked) == ["b", "a", "c"]
+    assert "a" in tracked and "d" not in tracked
+    tracked.remove("b")
+    assert list(tracked) == ["a", "c"]
+    assert ["x"] + tracked == ["x", "a", "c"]
+    assert len(tracked) == 2 and bool(TrackedSet()) == False
+
+
+# test def iter_folders_recursively_in_dir()
+def test_iter_folders_recursively_in_dir():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for folder in ["b/c", "a"]:
+            os.makedirs(os.path.join(temp_dir, folder))
+
+        def walk(order):
+            return [
+                os.path.relpath(folder["root"], temp_dir)
+                for folder in iter_folders_recursively_in_dir(temp_dir, order)
+            ]
+
+        assert walk("sorted") == [".", "a", "b", os.path.join("b", "c")]
+        deepest_first = walk("deepest_first")
+        assert deepest_first[-1] == "."
+        assert deepest_first.index(os.path.join("b", "c")) < deepest_first.index("b")
+
+
+# test def iter_sampled_files_in_directory(dir_path, files_per_dir=None, rng=random):
+def test_iter_sampled_files_in_directory():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        all_files = []
+        for index in range(20):
+            series = f"Series {index:02}"
+            os.makedirs(os.path.join(temp_dir, series))
+            for number in range(1, 4):
+                file = (
+                    f"{series} c{number:03}.cbz"
+                    if index < 10
+                    else f"{series} v{number:02}.cbz"
+                )
+                open(os.path.join(temp_dir, series, file), "w").close()
+                all_files.append(file)
+
+        rng = random.Random(0)
+        files = list(iter_sampled_files_in_directory(temp_dir, rng=rng))
+        assert sorted(files) == sorted(all_files)
+
+        # at most files_per_dir from each folder, with every folder reached
+        files = list(iter_sampled_files_in_directory(temp_dir, 2, rng=rng))
+        series = [file.split(" c")[0].split(" v")[0] for file in files]
+        assert len(set(series)) == 20
+        assert all(series.count(name) == 2 for name in set(series))
+
+        # the folders are read in a random order, not the walk order
+        first_files = list(
+            itertools.islice(iter_sampled_files_in_directory(temp_dir, 1, rng=rng), 6)
+        )
+        assert any(" c" in file for file in first_files)
+        assert any(" v" in file for file in first_files)
+
+
+# test def sample_file_types(files, chapter_threshold, volume_threshold, ...):
+def test_sample_file_types():
+    files = [f"Series v{number:03}.cbz" for number in range(1, 501)]
+    sampled, chapter_count = sample_file_types(files, 0.9, 0.9, min_sample=20)
+    assert 20 <= len(sampled) < 500
+    assert chapter_count == 0
+
+    # the extension split also has to be decided when an extension_threshold is passed
+    files = [
+        f"Series v{number:03}{'.epub' if number % 3 == 0 else '.cbz'}"
+        for number in range(1, 501)
+    ]
+    without_extensions = sample_file_types(files, 0.9, 0.9, min_sample=20)[0]
+    with_extensions = sample_file_types(
+        files, 0.9, 0.9, min_sample=20, extension_threshold=0.3
+    )[0]
+    assert len(with_extensions) > len(without_extensions)
+
+
+# test def metered_stage()
+def test_metered_stage():
+    @metered_stage
+    def parse_test_stage():
+        return upgrade_to_file_class(["Berserk v01.cbz"], "/test", test_mode=True)
+
+    parse_test_stage()
+    parse_test_stage()
+    metrics = stage_metrics["parse_test_stage"]
+    assert metrics.runs == 2 and metrics.files == 2
+    assert 'komga_cover_extractor_stage_runs_total{stage="parse_test_stage"} 2' in (
+        render_metrics()
+    )
+
+
+# test def get_collapsed_stacks()
+def test_get_collapsed_stacks():
+    def inner():
+        return sum(range(200000))
+
+    def outer():
+        return inner() + inner()
+
+    profiler = cProfile.Profile()
+    profiler.runcall(outer)
+    stacks = get_collapsed_stacks(pstats.Stats(profiler))
+    assert any(
+        stack.startswith("outer (") and ";inner (" in stack and seconds > 0
+        for stack, seconds in stacks.items()
+    )
+
+    # Only the slowest stacks are kept, none under the share of the total time
+    stats = pstats.Stats(profiler)
+    assert all(
+        seconds >= stats.total_tt * 0.01
+        for seconds in get_collapsed_stacks(stats, min_share=0.01).values()
+    )
+    slowest = get_collapsed_stacks(stats, max_stacks=1)
+    assert list(slowest.values()) == [max(stacks.values())]
+
+
+# test def write_to_file() with check_for_dup
+def test_write_to_file_check_for_dup():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for message in ["a", "b", "a", "c", "b"]:
+            write_to_file(
+                "dup_test.txt",
+                message,
+                without_timestamp=True,
+                check_for_dup=True,
+                write_to=temp_dir,
+                can_write_log=True,
+            )
+
+        with open(os.path.join(temp_dir, "dup_test.txt")) as f:
+            assert [line.strip() for line in f if line.strip()] == ["a", "b", "c"]
+
+
+# test class EventLog with log_file_events_max_size
+def test_event_log_rotation():
+    saved = (
+        komga_cover_extractor.LOGS_DIR,
+        komga_cover_extractor.log_file_events_max_size,
+    )
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            komga_cover_extractor.LOGS_DIR = temp_dir
+            komga_cover_extractor.log_file_events_max_size = 100
+            log = EventLog("events.jsonl")
+
+            log.log(path="a" * 100)
+            log.flush()
+            log.log(path="b")
+            log.flush()
+
+            with open(os.path.join(temp_dir, "events.jsonl.1")) as f:
+                assert json.loads(f.read())["path"] == "a" * 100
+            with open(os.path.join(temp_dir, "events.jsonl")) as f:
+                assert json.loads(f.read())["path"] == "b"
+    finally:
+        (
+            komga_cover_extractor.LOGS_DIR,
+            komga_cover_extractor.log_file_events_max_size,
+        ) = saved
+
+
+# test def open_zip(path, mode="r"):
+def test_open_zip():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, "test.cbz")
+        with zipfile.ZipFile(zip_path, "w") as zip:
+            zip.writestr("01.jpg", b"x" * 1000)
+
+        io_stats_by_file.pop(zip_path, None)
+        with open_zip(zip_path) as zip:
+            assert zip.read("01.jpg") == b"x" * 1000
+
+        stats = io_stats_by_file.pop(zip_path)
+        assert stats.opens == 1
+        assert stats.seeks > 0
+        assert stats.bytes_read >= 1000
+
+
+# test def extract(file_path, temp_dir, extension): and convert_to_cbz() with a 7z
+def test_convert_7z_to_cbz():
+    saved_download_folders = komga_cover_extractor.download_folders
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            series_dir = os.path.join(temp_dir, "Series")
+            os.makedirs(series_dir)
+            archive_path = os.path.join(series_dir, "Series v01.7z")
+            with py7zr.SevenZipFile(archive_path, "w") as archive:
+                archive.writestr(b"page one", "01.jpg")
+                archive.writestr(b"page two", "02.jpg")
+
+            with tempfile.TemporaryDirectory() as extract_dir:
+                assert extract(archive_path, extract_dir, ".7z") == True
+                assert sorted(os.listdir(extract_dir)) == ["01.jpg", "02.jpg"]
+            assert io_stats_by_file.pop(archive_path).opens == 1
+
+            archive_size = get_file_size(archive_path)
+            komga_cover_extractor.download_folders = [temp_dir]
+            convert_to_cbz()
+
+            # extracted in full, then only opened to list its files
+            stats = io_stats_by_file.pop(archive_path)
+            assert stats.opens == 2 and stats.bytes_read == archive_size
+
+            cbz_path = os.path.join(series_dir, "Series v01.cbz")
+            assert not os.path.isfile(archive_path)
+            with zipfile.ZipFile(cbz_path) as zip:
+                assert sorted(zip.namelist()) == ["01.jpg", "02.jpg"]
+                assert zip.read("02.jpg") == b"page two"
+    finally:
+        komga_cover_extractor.download_folders = saved_download_folders
+
+
 if __name__ == "__main__":
     validate_csv()
     # test_rename_files()
@@ -1940,6 +2533,7 @@ if __name__ == "__main__":
     test_contains_chapter_keywords()
     test_contains_volume_keywords()
     test_get_file_extension()
+    test_sniff_header_extension()
     test_get_extensionless_name()
     test_is_volume_one()
     test_get_series_name_from_chapter()
@@ -1947,10 +2541,16 @@ if __name__ == "__main__":
     test_check_for_multi_volume_file()
     test_convert_list_of_numbers_to_array()
     test_get_release_number_cache()
+    test_bounded_memo()
+    test_persisted_caches()
+    test_get_library_type()
+    test_parse_release_name()
     test_get_release_year()
     # test_get_extra_from_group()
+    test_bracketed_literal_matcher()
     test_get_file_part()
     # test_get_keyword_score()
+    test_get_keyword_score_compiled()
     test_remove_dual_space()
     test_normalize_str()
     test_clean_str()
@@ -1963,11 +2563,29 @@ if __name__ == "__main__":
     test_isfloat()
     test_isint()
     test_parse_html_tags()
+    test_parse_opf_tags()
+    test_parse_epub_descriptor_broken_container()
+    test_transcode_image()
+    test_write_file_atomically()
+    test_get_jpeg_quality()
     test_check_for_exception_keywords()
+    test_keyword_matcher()
     test_has_one_set_of_numbers()
     test_sorting_volumes_by_volume_number()
     test_organize_by_first_letter()
     test_contains_unicode()
     test_contains_punctuation()
     test_contains_brackets()
+    test_find_missing_volumes()
+    test_prune_volume_indexes()
+    test_tracked_set()
+    test_iter_folders_recursively_in_dir()
+    test_iter_sampled_files_in_directory()
+    test_sample_file_types()
+    test_metered_stage()
+    test_get_collapsed_stacks()
+    test_write_to_file_check_for_dup()
+    test_event_log_rotation()
+    test_open_zip()
+    test_convert_7z_to_cbz()
     print("ALL TESTS PASSED!")